@@ -1,11 +1,23 @@
+import asyncio
+import concurrent.futures
 import os
+import sys
+import tempfile
+import threading
+import time
+import types
 import unittest
+import unittest.mock
+from multiprocessing import shared_memory
 
 import h5py
 import numpy as np
 from numpy.testing import assert_array_equal
 
 import zh5
+from zh5.dataset import IOV_MAX, ChunkIndex, ChunkScatter, LocalChunkReader
+from zh5.link import LinkInfoMessage
+from zh5.scheduler import PRIORITY_PREFETCH, IOScheduler
 
 
 class Basic(unittest.TestCase):
@@ -26,6 +38,14 @@ class Basic(unittest.TestCase):
             f.create_dataset("2d", shape=(10, 10), chunks=(3, 3), compression="gzip", compression_opts=9)
             f["2d"][...] = np.arange(100).reshape((10, 10))
 
+    @staticmethod
+    def create_paged(name):
+        with h5py.File(name, "w", libver=("earliest", "latest"), fs_strategy="page", fs_page_size=4096,
+                       track_order=True) as f:
+            for i in range(20):
+                f.create_dataset(f"var{i}", data=np.arange(100, dtype="f4").reshape((10, 10)) + i, chunks=(5, 5),
+                                 compression="gzip")
+
     def test_1d(self):
         NAME = "1d.h5"
         Basic.create_1d(NAME)
@@ -65,6 +85,582 @@ class Basic(unittest.TestCase):
         f.close()
         os.remove(NAME)
 
+    def test_paged_cache_eviction(self):
+        NAME = "paged.h5"
+        Basic.create_paged(NAME)
+
+        f = zh5.PagedFile(NAME, page_cache_size=2 * 4096)
+        for i in range(20):
+            assert_array_equal(f[f"var{i}"][:], np.arange(100).reshape((10, 10)) + i)
+        self.assertGreater(f.cache_evictions, 0)
+        self.assertLessEqual(f._read_strategy.cache_nbytes, 4 * 4096)  # budget plus the pinned pages
+        f.close()
+
+        f = zh5.PagedFile(NAME)
+        assert_array_equal(f["var19"][:], np.arange(100).reshape((10, 10)) + 19)
+        self.assertEqual(f.cache_evictions, 0)
+        f.close()
+
+        os.remove(NAME)
+
+    def test_paged_disk_cache(self):
+        NAME = "paged.h5"
+        Basic.create_paged(NAME)
+
+        with tempfile.TemporaryDirectory() as directory:
+            f = zh5.PagedFile(NAME, disk_cache=directory)
+            assert_array_equal(f["var3"][:], np.arange(100).reshape((10, 10)) + 3)
+            self.assertGreater(f.disk_cache.misses, 0)
+            f.close()
+
+            disk_cache = zh5.DiskPageCache(directory)
+            f = zh5.PagedFile(NAME, disk_cache=disk_cache)
+            assert_array_equal(f["var3"][:], np.arange(100).reshape((10, 10)) + 3)
+            self.assertGreater(disk_cache.hits, 0)
+            self.assertEqual(disk_cache.misses, 0)
+            f.close()
+
+            # the prefetched pages already on disk are not written again
+            puts = []
+            disk_cache.put = lambda *args: puts.append(args[1])
+            f = zh5.PagedFile(NAME, disk_cache=disk_cache, prefetch_pages=1)
+            self.assertTrue(f.wait_prefetch())
+            namespace = zh5.DiskPageCache.namespace(NAME, f.validator, f.page_size)
+            f.close()
+            self.assertEqual(puts, [])
+
+            # a page evicted by another process between its read and its use time update is still a hit
+            with unittest.mock.patch("os.utime", side_effect=FileNotFoundError):
+                self.assertEqual(disk_cache.get(namespace, 0)[:8], b"\x89HDF\r\n\x1a\n")
+
+        with tempfile.TemporaryDirectory() as directory:
+            disk_cache = zh5.DiskPageCache(directory, max_size=3 * 4096)
+            f = zh5.PagedFile(NAME, disk_cache=disk_cache)
+            for i in range(20):
+                assert_array_equal(f[f"var{i}"][:], np.arange(100).reshape((10, 10)) + i)
+            f.close()
+            self.assertGreater(disk_cache.evictions, 0)
+            self.assertLessEqual(sum(size for _, size, _ in disk_cache._entries()), 3 * 4096)
+
+        os.remove(NAME)
+
+    def test_paged_read(self):
+        NAME = "paged.h5"
+        Basic.create_paged(NAME)
+        with open(NAME, "rb") as fh:
+            raw = fh.read()
+
+        f = zh5.PagedFile(NAME)
+        f.seek(4096 + 100)
+        byts = f.read(200)  # within one page, a view of the cached page
+        self.assertIsInstance(byts, memoryview)
+        self.assertEqual(byts, raw[4196:4396])
+        self.assertEqual(f.tell(), 4396)
+        f.seek(4096 - 50)
+        byts = f.read(100)  # across two pages, a new buffer
+        self.assertNotIsInstance(byts, memoryview)
+        self.assertEqual(bytes(byts), raw[4046:4146])
+        self.assertEqual(f.tell(), 4146)
+        f.close()
+
+        os.remove(NAME)
+
+    def test_paged_prefetch(self):
+        NAME = "paged.h5"
+        Basic.create_paged(NAME)
+
+        f = zh5.PagedFile(NAME)
+        assert_array_equal(f["var19"][:], np.arange(100).reshape((10, 10)) + 19)
+        misses = f.cache_misses
+        f.close()
+
+        f = zh5.PagedFile(NAME, prefetch_pages=64)
+        self.assertTrue(f.wait_prefetch())
+        assert_array_equal(f["var19"][:], np.arange(100).reshape((10, 10)) + 19)
+        self.assertEqual(f.cache_misses, 0)
+        self.assertEqual(f.prefetch_hits, misses)
+        f.close()
+
+        # the prefetch runs in the background after the reads of higher priority
+        scheduler = IOScheduler(max_in_flight=1)
+        started, release, order = threading.Event(), threading.Event(), []
+        scheduler.submit(lambda: started.set() or release.wait())
+        started.wait()
+        f = zh5.PagedFile(NAME, prefetch_pages=64, scheduler=scheduler)
+        demand = scheduler.submit(lambda: order.append(f.wait_prefetch(timeout=0)))
+        release.set()
+        demand.result()
+        self.assertEqual(order, [False])
+        assert_array_equal(f["var19"][:], np.arange(100).reshape((10, 10)) + 19)
+        self.assertTrue(f.wait_prefetch())
+        f.close()
+        scheduler.shutdown()
+
+        os.remove(NAME)
+
+    def test_many_links(self):
+        NAME = "links.h5"
+        with h5py.File(NAME, "w") as f:
+            for i in range(500):
+                f.create_dataset(f"var{i:03d}", data=np.arange(3, dtype="i4") + i)
+
+        for use_mmap in (True, False):
+            f = zh5.File(NAME, use_mmap=use_mmap)
+            self.assertEqual(sorted(f), [f"var{i:03d}" for i in range(500)])
+            assert_array_equal(f["var321"][:], np.arange(3) + 321)
+            f.close()
+
+        os.remove(NAME)
+
+    def test_scheduler(self):
+        scheduler = IOScheduler(max_in_flight=1)
+        started, release, order = threading.Event(), threading.Event(), []
+        blocker = scheduler.submit(lambda: started.set() or release.wait())
+        started.wait()
+
+        futures = [scheduler.submit(order.append, name, priority=priority, size=size)
+                   for name, priority, size in (("small", 0, 1), ("prefetch", PRIORITY_PREFETCH, 100),
+                                                ("large", 0, 10))]
+        self.assertEqual((scheduler.in_flight, scheduler.queued), (1, 3))
+        release.set()
+        for future in [blocker] + futures:
+            future.result()
+        self.assertEqual(order, ["large", "small", "prefetch"])
+
+        self.assertIsInstance(scheduler.submit(lambda: 1 / 0).exception(), ZeroDivisionError)
+        scheduler.shutdown()
+        self.assertEqual(scheduler.completed, 5)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(order.append, "late")
+
+        # a burst after a warm-up task, with an idle worker, runs concurrently on new workers
+        scheduler = IOScheduler(max_in_flight=4)
+        scheduler.submit(lambda: None).result()
+        time.sleep(0.1)  # the worker waits for tasks again
+        barrier = threading.Barrier(4, timeout=5)
+        for future in [scheduler.submit(barrier.wait) for _ in range(4)]:
+            future.result()  # BrokenBarrierError unless the 4 tasks run at the same time
+        scheduler.shutdown()
+
+    def test_parallel_decode(self):
+        NAME = "decode.h5"
+        data = np.random.default_rng(0).integers(0, 100, (64, 64)).astype("f8")
+        with h5py.File(NAME, "w") as f:
+            f.create_dataset("data", data=data, chunks=(8, 8), compression="gzip", shuffle=True, fletcher32=True)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+            for kwargs in ({}, {"decode_executor": executor}):
+                f = zh5.File(NAME, **kwargs)
+                assert_array_equal(f["data"][:], data)
+                assert_array_equal(f["data"][5:30, 17:18], data[5:30, 17:18])
+                f.close()
+
+        os.remove(NAME)
+
+    def test_positional_reads(self):
+        NAME = "2d.h5"
+        Basic.create_2d(NAME)
+
+        f = zh5.File(NAME)
+        fd = f.raw_fileno()
+        assert_array_equal(f["2d"][:], np.arange(100).reshape((10, 10)))
+        assert_array_equal(f["2d"][2:7, 4:9], np.arange(100).reshape((10, 10))[2:7, 4:9])
+        self.assertEqual(f.raw_fileno(), fd)  # one descriptor for all the reads
+
+        # a run of more adjacent chunks than the buffers a preadv takes
+        reader = LocalChunkReader(f, types.SimpleNamespace(pipeline=None))
+        chunks = [{"chunk_offset": (i,), "byte_offset": i, "byte_length": 1, "filter_mask": 0}
+                  for i in range(IOV_MAX + 10)]
+        with open(NAME, "rb") as fh:
+            raw = fh.read(len(chunks))
+        self.assertEqual(b"".join(bytes(buf) for _, buf in sorted(reader.fetch_chunks(chunks))), raw)
+
+        # chunks past the end of a truncated file fail instead of reading zeros
+        size = os.path.getsize(NAME)
+        for n in (1, 3):
+            chunks = [{"chunk_offset": (i,), "byte_offset": size - 4 + 8 * i, "byte_length": 8, "filter_mask": 0}
+                      for i in range(n)]
+            with self.assertRaises(ValueError):
+                list(reader.fetch_chunks(chunks))
+        f.close()
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+        os.remove(NAME)
+
+    def test_read_async(self):
+        NAME = "2d.h5"
+        Basic.create_2d(NAME)
+
+        async def main():
+            f = zh5.File(NAME)
+            ds, threads = f["2d"], []
+            plan = ds._plan
+
+            def record(*args):
+                threads.append(threading.current_thread())
+                return plan(*args)
+
+            ds._plan = record
+            result = await ds.read_async((slice(2, 7), slice(4, 9)))
+            self.assertEqual(len(threads), 1)
+            self.assertNotIn(threading.current_thread(), threads)  # local reads block, off the event loop
+            f.close()
+            return result
+
+        assert_array_equal(asyncio.run(main()), np.arange(100).reshape((10, 10))[2:7, 4:9])
+        os.remove(NAME)
+
+    def test_chunk_cache(self):
+        NAME = "2d.h5"
+        Basic.create_2d(NAME)
+        expected = np.arange(100).reshape((10, 10))
+
+        f = zh5.File(NAME, chunk_cache=2 ** 20)
+        assert_array_equal(f["2d"][:4, :4], expected[:4, :4])  # 4 chunks of 3x3 f4
+        self.assertEqual((f.chunk_cache.hits, f.chunk_cache.misses), (0, 4))
+        assert_array_equal(f["2d"][:], expected)  # only the 12 others are read
+        self.assertEqual((f.chunk_cache.hits, f.chunk_cache.misses), (4, 16))
+        self.assertEqual(f.chunk_cache.nbytes, 16 * 36)
+        f.close()
+
+        cache = zh5.LRUCache(4 * 36)  # shared by files, holds 4 chunks
+        for i in range(2):
+            f = zh5.File(NAME, chunk_cache=cache)
+            assert_array_equal(f["2d"][:], expected)
+            f.close()
+        self.assertEqual(cache.hits, 4)
+        self.assertEqual(cache.evictions, 12 + 12)
+
+        # the file rewritten at the same path, its chunks at the same addresses
+        cache = zh5.LRUCache(2 ** 20)
+        f = zh5.File(NAME, chunk_cache=cache)
+        assert_array_equal(f["2d"][:3, :3], expected[:3, :3])
+        f.close()
+        mtime = os.stat(NAME).st_mtime_ns
+        with h5py.File(NAME, "w") as h5f:
+            h5f.create_dataset("2d", data=expected.astype("f4") + 1, chunks=(3, 3), compression="gzip",
+                               compression_opts=9)
+        os.utime(NAME, ns=(mtime + 10 ** 9, mtime + 10 ** 9))  # a different time even with a coarse clock
+        f = zh5.File(NAME, chunk_cache=cache)
+        assert_array_equal(f["2d"][:3, :3], expected[:3, :3] + 1)
+        f.close()
+
+        os.remove(NAME)
+
+    def test_filter_mask(self):
+        NAME = "mask.h5"
+        with h5py.File(NAME, "w") as f:
+            ds = f.create_dataset("gzip", shape=(8,), dtype="i4", chunks=(4,), compression="gzip")
+            ds[4:] = np.arange(4, 8)
+            ds.id.write_direct_chunk((0,), np.arange(4, dtype="i4").tobytes(), filter_mask=1)  # stored uncompressed
+            ds = f.create_dataset("fletcher32", shape=(4,), dtype="i4", chunks=(4,), fletcher32=True)
+            ds.id.write_direct_chunk((0,), np.arange(4, dtype="i4").tobytes() + b"\0" * 4)  # wrong checksum
+
+        f = zh5.File(NAME)
+        assert_array_equal(f["gzip"][:], np.arange(8))
+        with self.assertRaises(RuntimeError):
+            f["fletcher32"][:]
+        f.close()
+
+        f = zh5.File(NAME, verify_checksums=False)
+        assert_array_equal(f["fletcher32"][:], np.arange(4))
+        f.close()
+
+        os.remove(NAME)
+
+    def test_decode_into(self):
+        NAME = "rows.h5"
+        data = np.arange(256, dtype="f4").reshape((16, 16))
+        with h5py.File(NAME, "w") as f:
+            f.create_dataset("rows", data=data, chunks=(2, 16), compression="gzip", shuffle=True)
+            f.create_dataset("tiles", data=data, chunks=(4, 4), compression="gzip", shuffle=True)
+
+        f = zh5.File(NAME)
+        out = np.empty((16, 16), dtype="f4")
+        everything = (slice(0, 16, 1), slice(0, 16, 1))
+        self.assertIsNotNone(ChunkScatter(out, everything, (2, 16), "f4").target((4, 0)))  # rows decode in place
+        self.assertIsNone(ChunkScatter(out, everything, (4, 4), "f4").target((4, 0)))  # tiles use a scratch buffer
+        for name in ("rows", "tiles"):
+            assert_array_equal(f[name][:], data)
+            assert_array_equal(f[name][3:9, 5:], data[3:9, 5:])
+            assert_array_equal(f[name][1:14:3, 2::5], data[1:14:3, 2::5])
+            assert_array_equal(f[name][7], data[7:8])
+        f.close()
+
+        os.remove(NAME)
+
+    def test_unsupported_filter(self):
+        NAME = "lzf.h5"
+        with h5py.File(NAME, "w") as f:
+            f.create_dataset("lzf", data=np.arange(100, dtype="i4"), chunks=(10,), compression="lzf")
+
+        f = zh5.File(NAME)
+        ds = f["lzf"]  # opens, only decoding needs the filter
+        self.assertEqual((ds.shape, ds.dtype), ((100,), "<i4"))
+        self.assertEqual(len(list(ds.inspect_chunks())), 10)
+        with self.assertRaises(ValueError):
+            ds[:]
+        f.close()
+
+        os.remove(NAME)
+
+    def test_dtypes(self):
+        NAME = "dtypes.h5"
+        data = 2 ** 40 + np.arange(120, dtype="i8").reshape((10, 12))  # not representable as f4
+        with h5py.File(NAME, "w") as f:
+            f.create_dataset("i8", data=data, chunks=(4, 5), compression="gzip")
+            f.create_dataset("u1", data=data.astype("u1"), chunks=(3, 3))
+            ds = f.create_dataset("sparse", shape=(10, 12), dtype="f8", chunks=(5, 6))
+            ds[:5, :6] = 1.5  # the other chunks are never stored
+
+        f = zh5.File(NAME)
+        for name, expected in (("i8", data), ("u1", data.astype("u1"))):
+            for sel in (np.s_[:], np.s_[2:3, :], np.s_[1:9:4, 3::7]):
+                result = f[name][sel]
+                self.assertEqual(result.dtype, expected.dtype)
+                assert_array_equal(result, expected[sel])
+        expected = np.zeros((10, 12))
+        expected[:5, :6] = 1.5
+        assert_array_equal(f["sparse"][3:8, 4:], expected[3:8, 4:])
+        f.close()
+
+        os.remove(NAME)
+
+    def test_read_direct(self):
+        NAME = "2d.h5"
+        Basic.create_2d(NAME)
+        expected = np.arange(100, dtype="f4").reshape((10, 10))
+
+        shm = shared_memory.SharedMemory(create=True, size=4 * 10 * 20)
+        try:
+            f = zh5.File(NAME)
+            out = np.ndarray((10, 20), dtype="f4", buffer=shm.buf)
+            out[...] = -1
+            f["2d"].read_direct(out, dest_sel=np.s_[:, 5:15])
+            assert_array_equal(out[:, 5:15], expected)
+            assert_array_equal(out[:, :5], -1)
+            f["2d"].read_direct(out, np.s_[7, 1:4], np.s_[0, :3])  # (1, 3) into (3,)
+            assert_array_equal(out[0, :3], expected[7, 1:4])
+            with self.assertRaises(ValueError):
+                f["2d"].read_direct(out, np.s_[:2], np.s_[:3])
+            del out
+            f.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        with h5py.File(NAME, "a") as f:
+            f.create_dataset("contiguous", data=np.arange(10, dtype="i4"))
+        out = np.memmap("out.dat", dtype="f8", mode="w+", shape=(2, 10))
+        f = zh5.File(NAME)
+        f["contiguous"].read_direct(out, dest_sel=np.s_[1])
+        f["2d"].read_direct(out, np.s_[3:4, :], np.s_[0])
+        assert_array_equal(out, [expected[3], np.arange(10)])
+        f.close()
+        del out
+
+        os.remove("out.dat")
+        os.remove(NAME)
+
+    def test_chunk_grid(self):
+        NAME = "2d.h5"
+        Basic.create_2d(NAME)
+        expected = np.arange(100).reshape((10, 10))
+
+        f = zh5.File(NAME)
+        ds = f["2d"]
+        rng = np.random.default_rng(0)
+        for i in range(50):
+            sel = tuple(slice(int(a), int(a + b), int(c)) for a, b, c in zip(rng.integers(0, 10, 2),
+                                                                            rng.integers(1, 10, 2),
+                                                                            rng.integers(1, 6, 2)))
+            rows, cols = (range(*s.indices(10)) for s in sel)
+            touched = sorted({(r // 3, c // 3) for r in rows for c in cols})
+            self.assertEqual(list(ds.get_chunk_coords(sel)), touched)
+            assert_array_equal(ds[sel], expected[sel])
+        f.close()
+
+        os.remove(NAME)
+
+    def test_lazy_btree(self):
+        NAME = "lazy.h5"
+        with h5py.File(NAME, "w") as f:
+            f.create_dataset("many", data=np.arange(8000, dtype="i4"), chunks=(2,))
+            f.create_dataset("empty", shape=(10,), dtype="i4", chunks=(2,))
+            sparse = f.create_dataset("sparse", shape=(8000,), dtype="i4", chunks=(2,))
+            sparse[::10] = np.arange(800)
+            expected = sparse[:]
+
+        f = zh5.File(NAME)
+        ds = f["many"]
+        self.assertEqual(len(ds._btree_nodes), 0)  # opening reads no node
+        assert_array_equal(ds[1001:1006], np.arange(1001, 1006))
+        nodes = len(ds._btree_nodes)
+        self.assertLessEqual(nodes, 3)  # one path from the root to the leaves
+        assert_array_equal(ds[1001:1006], np.arange(1001, 1006))
+        self.assertEqual(len(ds._btree_nodes), nodes)
+        assert_array_equal(ds[:], np.arange(8000))
+        assert_array_equal(f["empty"][:], np.zeros(10))
+
+        index = f["many"].chunk_index()
+        self.assertEqual(len(index), 4000)
+        assert_array_equal(index.chunk_offsets[:, 0], np.arange(0, 8000, 2))
+        self.assertTrue(np.all(np.diff(index.keys) > 0))
+        self.assertTrue(np.all(index.sizes == 8))
+        self.assertEqual(len(f["empty"].chunk_index()), 0)
+
+        ds = f["sparse"]
+        assert_array_equal(ds[3000:3100], expected[3000:3100])
+        nodes = len(ds._btree_nodes)
+        keys = ds._index.linear(np.arange(3000, 3100, 2).reshape(-1, 1))
+        self.assertFalse(ds._index.unknown(keys).any())  # the ranges of the leaves read, holes included
+        assert_array_equal(ds[3001:3099], expected[3001:3099])
+        self.assertEqual(len(ds._btree_nodes), nodes)
+        assert_array_equal(ds[:], expected)
+
+        index = ChunkIndex((10,), (2,))
+        index.add([[6], [2]], [60, 20], [8, 8], [0, 0], known=[(0, 2), (1, 4)])
+        index.add([[2], [4]], [0, 40], [8, 8], [0, 0])
+        assert_array_equal(index.keys, [1, 2, 3])
+        assert_array_equal(index.addresses, [20, 40, 60])  # chunks already indexed are kept
+        assert_array_equal(index.unknown(np.arange(5)), [False, False, False, False, True])
+        f.close()
+
+        os.remove(NAME)
+
+    def test_fill_value(self):
+        NAME = "fill.h5"
+        for libver in ("earliest", "v108"):  # fill value message versions 2 and 3
+            with h5py.File(NAME, "w", libver=libver) as f:
+                sparse = f.create_dataset("sparse", shape=(10, 10), dtype="f4", chunks=(3, 3), fillvalue=7.5)
+                sparse[4:6, 4:6] = 1
+                expected = sparse[:]
+                f.create_dataset("empty", shape=(10,), dtype="i2", chunks=(2,), fillvalue=-3)
+                f.create_dataset("zeros", shape=(10,), dtype="i2", chunks=(2,))
+
+            f = zh5.File(NAME)
+            self.assertEqual(f["sparse"].fill_value, 7.5)
+            assert_array_equal(f["sparse"][:], expected)
+            assert_array_equal(f["sparse"][1:5, 2:9], expected[1:5, 2:9])
+            assert_array_equal(f["empty"][:], np.full(10, -3))
+            self.assertIsNone(f["zeros"].fill_value)
+            assert_array_equal(f["zeros"][:], np.zeros(10))
+            f.close()
+
+        os.remove(NAME)
+
+    def test_concurrent_reads(self):
+        NAME = "concurrent.h5"
+        rng = np.random.default_rng(0)
+        data = [rng.integers(0, 1000, (300, 400), dtype="i4") for _ in range(6)]
+        with h5py.File(NAME, "w") as f:
+            for i, arr in enumerate(data):
+                f.create_dataset(f"d{i}", data=arr, chunks=(3, 4))
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # interleave the b-tree descents of the threads
+        try:
+            for use_mmap in (True, False):
+                f = zh5.File(NAME, use_mmap=use_mmap)
+                datasets = [f[f"d{i}"] for i in range(len(data))]
+                errors = []
+
+                def read(i):
+                    r = np.random.default_rng(i)
+                    for _ in range(10):
+                        a, b = r.integers(0, 250), r.integers(0, 350)
+                        try:
+                            if not np.array_equal(datasets[i][a:a + 50, b:b + 50], data[i][a:a + 50, b:b + 50]):
+                                errors.append(i)
+                        except Exception as e:
+                            errors.append(e)
+
+                threads = [threading.Thread(target=read, args=(i,)) for i in range(len(data))]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                f.close()
+                self.assertEqual(errors, [])
+        finally:
+            sys.setswitchinterval(interval)
+
+        os.remove(NAME)
+
+    def test_btree_nodes(self):
+        NAME = "nodes.h5"
+        with h5py.File(NAME, "w") as f:
+            f.create_dataset("2d", data=np.arange(200 * 300).reshape(200, 300), chunks=(7, 9))
+            for i in range(300):  # several symbol table nodes
+                f.create_dataset(f"m{i}", data=[i])
+
+        with h5py.File(NAME) as f:
+            dsid = f["2d"].id
+            expected = sorted((tuple(c.chunk_offset), c.byte_offset, c.size)
+                              for c in map(dsid.get_chunk_info, range(dsid.get_num_chunks())))
+
+        f = zh5.File(NAME)
+        ds = f["2d"]
+        self.assertGreater(ds.btree.level, 0)
+        chunks = list(ds.inspect_chunks())
+        self.assertEqual(sorted((c["chunk_offset"], c["offset"], c["length"]) for c in chunks), expected)
+        self.assertTrue(all(n["entry"] < 2 * f.indexed_storage_internal_node_k for n in ds.inspect_btree()))
+        index = ds.chunk_index()
+        self.assertEqual(sorted(zip(map(tuple, index.chunk_offsets.tolist()), index.addresses.tolist(),
+                                    index.sizes.tolist())), expected)
+        assert_array_equal(ds[:], np.arange(200 * 300).reshape(200, 300))
+
+        names = [link.name for link in f.root_group.links()]
+        self.assertEqual(sorted(names), sorted(["2d"] + [f"m{i}" for i in range(300)]))
+        assert_array_equal(f["m299"][:], [299])
+        f.close()
+
+        os.remove(NAME)
+
+    def test_dense_group(self):
+        NAME = "dense.h5"
+        with h5py.File(NAME, "w", libver="latest") as f:
+            for i in range(5000):
+                f.create_dataset(f"m{i}", data=[i])
+            f.create_group("ordered", track_order=True)
+
+        f = zh5.File(NAME)
+        names = [link.name for link in f.root_group.links()]
+        self.assertEqual(sorted(names), sorted([f"m{i}" for i in range(5000)] + ["ordered"]))
+        for i in range(0, 5000, 499):
+            assert_array_equal(f[f"m{i}"][:], [i])
+        self.assertIsNone(f.root_group.get_link("m5000"))
+
+        lim = next(LinkInfoMessage(f, m["offset"]) for m in f.root_group._do.msgs() if m["type"] == 2)
+        self.assertGreater(lim.name_index.depth, 0)
+        self.assertEqual(lim.get("m1234").name, "m1234")
+        self.assertLessEqual(len(lim.name_index._nodes), lim.name_index.depth + 1)  # one path to a leaf
+        f.close()
+
+        # tens of thousands of links, the heap holds them in indirect blocks below the root one
+        with h5py.File(NAME, "w", libver="latest") as f:
+            datasets = [f.create_dataset(f"d{i}", data=[i]) for i in range(7)]
+            for i in range(30000):
+                f[f"member_{i:08d}_with_a_longer_name"] = datasets[i % 7]
+
+        f = zh5.File(NAME)
+        group = f.root_group
+        for i in range(0, 30000, 1499):
+            assert_array_equal(f[f"member_{i:08d}_with_a_longer_name"][:], [i % 7])
+        lim = group._link_info(next(m["offset"] for m in group._msgs() if m["type"] == 2))
+        self.assertGreater(len(lim._heap._indirect_blocks), 1)
+
+        reads, read = [], f.read
+        f.read = lambda n: reads.append(n) or read(n)
+        name = "member_00012345_with_a_longer_name"
+        self.assertEqual(group.get_link(name).name, name)
+        self.assertLessEqual(len(reads), lim.name_index.depth + 2)  # the nodes on the way, a heap block and the link
+        self.assertEqual(sum(1 for _ in group.links()), 30007)
+        f.close()
+
+        os.remove(NAME)
+
 
 if __name__ == "__main__":
     unittest.main()
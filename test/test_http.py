@@ -0,0 +1,368 @@
+import asyncio
+import http.server
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+
+import h5py
+import numpy as np
+from numpy.testing import assert_array_equal
+
+import zh5
+from zh5.dataset import coalesce_chunks
+from zh5.remote import HTTPConnectionPool, HTTPRangeReader, RetryPolicy
+from zh5.scheduler import IOScheduler
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _data(self):
+        with open(os.path.join(self.server.directory, self.path.lstrip("/")), "rb") as f:
+            return f.read()
+
+    def do_HEAD(self):
+        with self.server.lock:
+            self.server.requests += 1
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self._data())))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            fault = self.server.faults.pop(0) if self.server.faults else None
+        data = self._data()
+        if isinstance(fault, int):  # an error status
+            self.send_error(fault)
+            return
+        if isinstance(fault, float):  # a delay in seconds
+            time.sleep(fault)
+        ranges = [(int(start), min(int(end), len(data) - 1))
+                  for start, end in re.findall(r"(\d+)-(\d+)", self.headers.get("Range", ""))]
+        if not ranges or (len(ranges) > 1 and not self.server.multipart):
+            self.send_response(200)
+            body = data
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            body = b""
+            for start, end in ranges:
+                body += (f"--BOUNDARY\r\nContent-Type: application/octet-stream\r\n"
+                         f"Content-Range: bytes {start}-{end}/{len(data)}\r\n\r\n").encode("ascii")
+                body += data[start:end + 1] + b"\r\n"
+            body += b"--BOUNDARY--\r\n"
+            self.send_response(206)
+            self.send_header("Content-Type", "multipart/byteranges; boundary=BOUNDARY")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RangeServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory):
+        super().__init__(("127.0.0.1", 0), RangeRequestHandler)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.multipart = True
+        self.faults = []  # consumed by the next GET requests, an int answers that status, a float delays the answer
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # clients give up on delayed answers
+            super().handle_error(request, client_address)
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server_address[1]}/{name}"
+
+
+class LocalHTTP(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        with h5py.File(os.path.join(cls.directory, "data.h5"), "w") as f:
+            f.create_dataset("1dfilters", data=np.arange(10, dtype="f8"), chunks=(2,), fletcher32=True,
+                             shuffle=True, compression="gzip")
+            f.create_dataset("2d", data=np.arange(100, dtype="f4").reshape((10, 10)), chunks=(3, 3),
+                             compression="gzip")
+            f.create_dataset("contiguous", data=np.arange(10, dtype="i4"))
+
+        cls.server = RangeServer(cls.directory)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.directory)
+
+    def test_read(self):
+        f = zh5.File(self.server.url("data.h5"), pool=HTTPConnectionPool())
+        assert_array_equal(f["1dfilters"][:], np.arange(10))
+        assert_array_equal(f["2d"][3:, 6:9], np.arange(100).reshape((10, 10))[3:, 6:9])
+        assert_array_equal(f["contiguous"][2:5], np.arange(2, 5))
+        f.close()
+
+    def test_keep_alive(self):
+        pool = HTTPConnectionPool(maxsize=2)
+        connections = self.server.connections
+        f = zh5.File(self.server.url("data.h5"), pool=pool, head_size=0)
+        assert_array_equal(f["2d"][:], np.arange(100).reshape((10, 10)))
+        f.close()
+
+        self.assertGreater(pool.requests, 10)
+        self.assertLessEqual(pool.connections_created, 2)
+        self.assertLessEqual(self.server.connections - connections, 2)
+
+    def test_block_cache(self):
+        url = self.server.url("data.h5")
+        with open(os.path.join(self.directory, "data.h5"), "rb") as f:
+            data = f.read()
+
+        pool = HTTPConnectionPool()
+        reader = HTTPRangeReader(url, pool=pool, block_size=1024, block_cache_size=4096)
+        self.assertEqual(reader.read_range(10, 100), data[10:110])
+        self.assertEqual(reader.read_range(1000, 100), data[1000:1100])  # spans two blocks, one cached
+        self.assertEqual(reader.read_range(500, 1), data[500:501])
+        self.assertEqual(pool.requests, 2)
+        self.assertEqual(reader.block_cache.nbytes, 2048)
+
+        reader.read_range(2048, 4096)  # evicts the first blocks
+        self.assertEqual(reader.block_cache.nbytes, 4096)
+        self.assertGreater(reader.block_cache.evictions, 0)
+
+        requests = pool.requests
+        f = zh5.File(url, pool=pool, block_size=2 ** 16, head_size=0)
+        assert_array_equal(f["1dfilters"][:], np.arange(10))
+        f.close()
+        self.assertLess(pool.requests - requests, 10)
+
+    def test_coalesce(self):
+        chunks = [{"chunk_offset": (i,), "byte_offset": o, "byte_length": 10} for i, o in enumerate([0, 10, 25, 100])]
+        self.assertEqual([[c["chunk_offset"] for c in g] for g in coalesce_chunks(chunks, max_gap=5, max_size=30)],
+                         [[(0,), (1,)], [(2,)], [(3,)]])
+        self.assertEqual(len(coalesce_chunks(chunks, max_gap=100)), 1)
+        self.assertEqual(len(coalesce_chunks(chunks, max_gap=None)), 4)
+
+        pool = HTTPConnectionPool()
+        for gap, saved in ((None, 0), (4096, 15)):
+            f = zh5.File(self.server.url("data.h5"), pool=pool, coalesce_gap=gap)
+            ds = f["2d"]
+            assert_array_equal(ds[:], np.arange(100).reshape((10, 10)))
+            self.assertEqual(ds.chunk_reader.requests_saved, saved)
+            f.close()
+
+    def test_multirange(self):
+        with open(os.path.join(self.directory, "data.h5"), "rb") as f:
+            data = f.read()
+        ranges = [(0, 8), (100, 50), (1000, 1), (120, 10)]
+
+        try:
+            for multipart in (True, False):
+                self.server.multipart = multipart
+                pool = HTTPConnectionPool()
+                reader = HTTPRangeReader(self.server.url("data.h5"), pool=pool, multirange=True)
+                self.assertEqual(reader.read_ranges(ranges), [data[o:o + s] for o, s in ranges])
+                self.assertEqual(reader.multirange, multipart)
+                self.assertEqual(pool.requests, 1 if multipart else 1 + len(ranges))  # the 200 body is dropped
+
+                status, _, body = pool.request("GET", self.server.url("data.h5"), {"Range": "bytes=0-0,2-2"},
+                                               partial=True)
+                self.assertEqual((status, body is None), (206, False) if multipart else (200, True))
+
+                f = zh5.File(self.server.url("data.h5"), pool=pool, coalesce_gap=None, multirange=True)
+                ds = f["2d"]
+                assert_array_equal(ds[:], np.arange(100).reshape((10, 10)))
+                self.assertEqual(ds.chunk_reader.requests_saved, 15 if multipart else 0)
+                f.close()
+        finally:
+            self.server.multipart = True
+
+    def test_paged_prefetch(self):
+        url = self.server.url("paged.h5")
+        with h5py.File(os.path.join(self.directory, "paged.h5"), "w", libver=("earliest", "latest"),
+                       fs_strategy="page", fs_page_size=4096, track_order=True) as f:
+            for i in range(20):
+                f.create_dataset(f"var{i}", data=np.arange(100, dtype="f4") + i, chunks=(50,), compression="gzip")
+
+        pool = HTTPConnectionPool()
+        zh5.PagedFile(url, pool=pool, head_size=0).close()
+        opened = pool.requests
+
+        # the lookup right after opening waits for the prefetch instead of reading its pages again
+        pool = HTTPConnectionPool()
+        f = zh5.PagedFile(url, pool=pool, head_size=0, prefetch_pages=64)
+        self.assertEqual(f["var19"].shape, (100,))
+        self.assertEqual(pool.requests, opened + 1)
+        self.assertEqual(f.cache_misses, 0)
+        self.assertGreater(f.prefetch_hits, 0)
+        assert_array_equal(f["var19"][:], np.arange(100) + 19)
+        f.close()
+
+    def test_single_request_open(self):
+        url = self.server.url("data.h5")
+        pool = HTTPConnectionPool()
+        f = zh5.File(url, pool=pool)
+        ds = f["2d"]
+        self.assertEqual(pool.requests, 1)  # the file is smaller than the head, no HEAD request either
+        self.assertEqual(f._fh.length, os.path.getsize(os.path.join(self.directory, "data.h5")))
+        assert_array_equal(ds[:], np.arange(100).reshape((10, 10)))
+        f.close()
+
+        pool = HTTPConnectionPool()
+        f = zh5.File(url, pool=pool, head_size=1024)
+        assert_array_equal(f["2d"][:], np.arange(100).reshape((10, 10)))
+        self.assertGreater(pool.requests, 2)
+        f.close()
+
+    def test_retry(self):
+        url = self.server.url("data.h5")
+        with open(os.path.join(self.directory, "data.h5"), "rb") as f:
+            data = f.read()
+
+        try:
+            pool = HTTPConnectionPool()
+            reader = HTTPRangeReader(url, pool=pool, retry=RetryPolicy(retries=2, backoff=0.001))
+            self.server.faults = [503, 503]
+            self.assertEqual(reader.read_range(10, 100), data[10:110])
+            self.assertEqual(reader.retries, 2)
+
+            self.server.faults = [503, 503, 503]
+            with self.assertRaises(urllib.error.HTTPError):
+                reader.read_range(10, 100)
+            self.server.faults = [404]  # not transient, no retry
+            with self.assertRaises(urllib.error.HTTPError):
+                reader.read_range(10, 100)
+            self.assertEqual(reader.retries, 4)
+
+            # a read timeout on a stalled response
+            reader = HTTPRangeReader(url, pool=HTTPConnectionPool(timeout=0.2), retry=RetryPolicy(backoff=0.001))
+            self.server.faults = [1.0]
+            self.assertEqual(reader.read_range(10, 100), data[10:110])
+            self.assertEqual(reader.retries, 1)
+
+            f = zh5.File(url, pool=HTTPConnectionPool(), retry=RetryPolicy(backoff=0.001))
+            ds = f["2d"]
+            self.server.faults = [500, 502, 429]
+            assert_array_equal(ds[:], np.arange(100).reshape((10, 10)))
+            self.assertEqual(ds.chunk_reader.last_read_stats, {"retries": 3, "hedges": 0})
+            f.close()
+        finally:
+            self.server.faults = []
+
+    def test_hedge(self):
+        url = self.server.url("data.h5")
+        with open(os.path.join(self.directory, "data.h5"), "rb") as f:
+            data = f.read()
+
+        reader = HTTPRangeReader(url, pool=HTTPConnectionPool(), retry=RetryPolicy(hedge=True, hedge_min_samples=5))
+        for i in range(5):
+            reader.read_range(i * 100, 100)
+        self.assertEqual(reader.hedges, 0)
+
+        try:
+            self.server.faults = [2.0]
+            start = time.monotonic()
+            self.assertEqual(reader.read_range(600, 100), data[600:700])
+            self.assertLess(time.monotonic() - start, 1.0)  # the hedged request answered first
+            self.assertEqual(reader.hedges, 1)
+        finally:
+            self.server.faults = []
+        reader.close()
+
+        # slow requests holding every connection of the pool, the hedges use connections of their own
+        def slow_reads(reader, n, delay):
+            for i in range(5):  # hedges after about 0.1 s, once every slow request reached the server
+                self.server.faults = [0.1]
+                reader.read_range(i * 100, 100)
+            self.server.faults = [delay] * n
+            threads = [threading.Thread(target=reader.read_range, args=(i * 100, 100)) for i in range(n)]
+            start = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return time.monotonic() - start
+
+        retry = RetryPolicy(hedge=True, hedge_min_samples=5)
+        try:
+            reader = HTTPRangeReader(url, pool=HTTPConnectionPool(maxsize=2), retry=retry)
+            self.assertLess(slow_reads(reader, 2, 2.0), 1.0)
+            self.assertEqual(reader.hedges, 2)
+            reader.close()
+
+            # slow requests filling every worker of the hedge executor are not hedged
+            reader = HTTPRangeReader(url, pool=HTTPConnectionPool(maxsize=2), retry=retry)
+            slow_reads(reader, 4, 0.5)
+            self.assertEqual(reader.hedges, 0)
+            reader.close()
+        finally:
+            self.server.faults = []
+
+    def test_read_async(self):
+        async def main():
+            async with await zh5.File.open_async(self.server.url("data.h5"), pool=HTTPConnectionPool(),
+                                                 head_size=0) as f:
+                datasets = [f["1dfilters"], f["2d"], f["contiguous"]]
+                session = f.async_session()
+
+                threads = []
+
+                def record(fn):
+                    def recorded(*args, **kwargs):
+                        threads.append(threading.current_thread())
+                        return fn(*args, **kwargs)
+                    return recorded
+
+                f._fh._request = record(f._fh._request)  # blocking metadata requests
+                for ds in datasets[:2]:
+                    ds.pipeline.decode = record(ds.pipeline.decode)  # decompression
+                results = await asyncio.gather(*[ds.read_async() for ds in datasets], datasets[1].read_async((3, 2)))
+                self.assertGreater(len(threads), 0)
+                self.assertNotIn(threading.current_thread(), threads)  # the event loop never blocks on them
+                self.assertIs(f.async_session(), session)
+            self.assertTrue(session.closed)
+            return results
+
+        results = asyncio.run(main())
+        assert_array_equal(results[0], np.arange(10))
+        assert_array_equal(results[1], np.arange(100).reshape((10, 10)))
+        assert_array_equal(results[2], np.arange(10))
+        assert_array_equal(results[3], np.arange(100).reshape((10, 10))[3:4, 2:3])
+
+    def test_shared_scheduler(self):
+        scheduler = IOScheduler(max_in_flight=2)
+        files = [zh5.File(self.server.url("data.h5"), pool=HTTPConnectionPool(), scheduler=scheduler)
+                 for i in range(2)]
+        for f in files:
+            self.assertIs(f["2d"].chunk_reader.scheduler, scheduler)
+            assert_array_equal(f["2d"][:], np.arange(100).reshape((10, 10)))
+            f.close()
+        self.assertEqual(scheduler.completed, 2)  # one coalesced request per read
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1 +1,2 @@
+from .cache import DiskPageCache, LRUCache
 from .file import File, PagedFile, SplitFile
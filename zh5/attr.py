@@ -26,7 +26,7 @@ class AttributeMessage:
     @property
     def name(self):
         self._fh.seek(self._offset + 8)
-        byts = self._fh.read(self._name_size)
+        byts = bytes(self._fh.read(self._name_size))
         logging.debug(f"Read attribute name bytes {byts}")
 
         return byts.decode("utf-8").replace("\x00", "")
@@ -35,7 +35,7 @@ class AttributeMessage:
     def value(self):
         offset = 8 + self._name_size + self._dataspace_size + self._datatype_size
         self._fh.seek(self._offset + offset)
-        byts = self._fh.read(self._size - offset)
+        byts = bytes(self._fh.read(self._size - offset))
         logging.debug(f"Read attribute value bytes {byts}")
 
         return byts.decode("utf-8").replace("\x00", "")
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, eviction is then not serialized between processes
+    fcntl = None
+
+
+def nbytes(value):
+    """Size of any buffer, e.g. bytes or the NumPy arrays some codecs decode to."""
+    return memoryview(value).nbytes
+
+
+class LRUCache:
+    """Least recently used cache holding at most `capacity` bytes, unbounded when `capacity` is None. Pinned keys are
+    never evicted."""
+
+    def __init__(self, capacity=None, sizeof=len):
+        self._capacity = capacity
+        self._sizeof = sizeof
+
+        self._data = OrderedDict()  # key -> (value, size)
+        self._nbytes = 0
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return self._data[key][0]
+
+            self._misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._nbytes -= self._data.pop(key)[1]
+            if self._capacity is not None and size > self._capacity:
+                return  # would evict everything else and then itself
+
+            self._data[key] = (value, size)
+            self._nbytes += size
+            self._evict()
+
+    def pin(self, key):
+        """Keeps `key` in the cache once it is inserted, it may be pinned before being inserted."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def _evict(self):
+        if self._capacity is None or self._nbytes <= self._capacity:
+            return
+
+        for key in list(self._data):  # from least to most recently used
+            if key in self._pinned:
+                continue
+            value, size = self._data.pop(key)
+            self._nbytes -= size
+            self._evictions += 1
+            if self._nbytes <= self._capacity:
+                break
+
+    def clear(self):
+        """Drops all the values and resets the counters, pinned keys stay pinned."""
+        with self._lock:
+            self._data = OrderedDict()
+            self._nbytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def pinned(self):
+        return frozenset(self._pinned)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+
+class DiskPageCache:
+    """Pages stored as files under `directory`, shared by all the processes of a node. Pages are written to a
+    temporary file and renamed, so readers never see partial pages. The total size is kept under `max_size` bytes
+    (unbounded if None) by removing the least recently used pages."""
+
+    def __init__(self, directory, max_size=None):
+        self._directory = directory
+        self._max_size = max_size
+        os.makedirs(self._directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._written = 0  # bytes written since the last eviction scan
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def namespace(*args):
+        """Directory name for the pages of one version of one file, e.g. namespace(url, validator, page_size)."""
+        return hashlib.sha256("\0".join(str(arg) for arg in args).encode("utf-8")).hexdigest()
+
+    def _path(self, namespace, key):
+        return os.path.join(self._directory, namespace, str(key))
+
+    def get(self, namespace, key):
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+        except FileNotFoundError:  # never written, or evicted by another process
+            with self._lock:
+                self._misses += 1
+            return None
+        try:
+            os.utime(path)  # the modification time tracks the last use
+        except FileNotFoundError:  # evicted since it was read, the bytes are still good
+            pass
+
+        with self._lock:
+            self._hits += 1
+        return value
+
+    def contains(self, namespace, key):
+        return os.path.exists(self._path(namespace, key))
+
+    def put(self, namespace, key, value):
+        dirname = os.path.join(self._directory, namespace)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, self._path(namespace, key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        if self._max_size is not None:
+            with self._lock:
+                self._written += len(value)
+                scan = self._written > self._max_size // 16
+                if scan:
+                    self._written = 0
+            if scan:
+                self.evict()
+
+    def _entries(self):
+        for namespace in os.scandir(self._directory):
+            if not namespace.is_dir():
+                continue
+            for entry in os.scandir(namespace.path):
+                if entry.name.startswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime, st.st_size, entry.path
+
+    def evict(self):
+        """Removes the least recently used pages until the cache is under its maximum size."""
+        if self._max_size is None:
+            return
+
+        with open(os.path.join(self._directory, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self._max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                with self._lock:
+                    self._evictions += 1
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        return self._evictions
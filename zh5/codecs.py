@@ -1,4 +1,5 @@
 import numcodecs
+import numcodecs.compat
 
 
 class FilterDescription:
@@ -56,7 +57,7 @@ class FilterDescriptionV1(FilterDescription):
     def name(self):
         if self._name is None:
             self._f.seek(self._offset_data)
-            name = self._f.read(self._name_length)
+            name = bytes(self._f.read(self._name_length))
             if int.from_bytes(name, "little") != 0:
                 self._name = name.replace(b"\x00", b"").decode("ascii")
             else:
@@ -109,7 +110,7 @@ class FilterDescriptionV2(FilterDescription):
                 self._name = ""
             else:
                 self._f.seek(self._offset_data)
-                byts = self._f.read(self._name_length)
+                byts = bytes(self._f.read(self._name_length))
                 self._name = byts.replace(b"\x00", b"").decode("ascii")
 
         return self._name
@@ -131,10 +132,51 @@ class FilterDescriptionV2(FilterDescription):
         return self._client_data
 
 
+class CompiledFilterPipeline:
+    """Decode chain of a dataset built once from its filter pipeline message, immutable so it can be shared by threads
+    and pickled for process pools. Fletcher32 checksums are only stripped if `verify_checksums` is False."""
+
+    def __init__(self, filters, verify_checksums=True):
+        self._filters = tuple(filters)
+        self._verify_checksums = verify_checksums
+
+    def __len__(self):
+        return len(self._filters)
+
+    @property
+    def filters(self):
+        return self._filters
+
+    @property
+    def verify_checksums(self):
+        return self._verify_checksums
+
+    def decode(self, byts, filter_mask=0, out=None):
+        """Undoes the filters of a chunk in reverse order, skipping filter i if bit i of `filter_mask` is set (the
+        filter was optional and failed when writing the chunk). The last filter writes into `out` if given, a
+        contiguous buffer of the decoded size, the others allocate their output."""
+        stages = [f for i, f in reversed(list(enumerate(self._filters))) if not filter_mask >> i & 1]
+        for k, f in enumerate(stages):
+            last = k == len(stages) - 1
+            if not self._verify_checksums and isinstance(f, numcodecs.Fletcher32):
+                byts = memoryview(byts)[:-4]
+                if last and out is not None:
+                    byts = numcodecs.compat.ndarray_copy(byts, out)
+            else:
+                byts = f.decode(byts, out=out if last else None)
+
+        if not stages and out is not None:
+            byts = numcodecs.compat.ndarray_copy(byts, out)
+        return byts
+
+
 class FilterPipeline:
     def filter_descriptions(self):
         raise NotImplementedError
 
+    def compile(self, verify_checksums=True):
+        return CompiledFilterPipeline(self.filters(), verify_checksums)
+
     def filters(self):
         for fd in self.filter_descriptions():
             if fd.id == 1:
@@ -157,19 +199,22 @@ class FilterPipelineMessageV1(FilterPipeline):
         byts = self._f.read(2)
         self._version = byts[0]
         self._number_of_filters = byts[1]  # max 32
+        self._filter_descriptions = None
 
         assert self._version == 1
         assert self._number_of_filters <= 32
 
     def filter_descriptions(self):
-        filters = []
-        offset = self._filters_offset
-        for i in range(self._number_of_filters):
-            f = FilterDescriptionV1(self._f, offset)
-            filters.append(f)
-            offset += f.size
+        if self._filter_descriptions is None:
+            filters = []
+            offset = self._filters_offset
+            for i in range(self._number_of_filters):
+                f = FilterDescriptionV1(self._f, offset)
+                filters.append(f)
+                offset += f.size
+            self._filter_descriptions = filters
 
-        return filters
+        return self._filter_descriptions
 
 
 class FilterPipelineMessageV2(FilterPipeline):
@@ -182,13 +227,16 @@ class FilterPipelineMessageV2(FilterPipeline):
         byts = self._f.read(2)
         self._version = byts[0]
         self._number_of_filters = byts[1]
+        self._filter_descriptions = None
 
     def filter_descriptions(self):
-        filters = []
-        offset = self._filters_offset
-        for i in range(self._number_of_filters):
-            f = FilterDescriptionV2(self._f, offset)
-            filters.append(f)
-            offset += f.size
-
-        return filters
+        if self._filter_descriptions is None:
+            filters = []
+            offset = self._filters_offset
+            for i in range(self._number_of_filters):
+                f = FilterDescriptionV2(self._f, offset)
+                filters.append(f)
+                offset += f.size
+            self._filter_descriptions = filters
+
+        return self._filter_descriptions
@@ -1,6 +1,10 @@
 import asyncio
+import collections
 import concurrent.futures
-import urllib.request
+import logging
+import os
+import threading
+import time
 
 import aiohttp
 import numpy as np
@@ -8,7 +12,19 @@ import numpy as np
 from zh5.codecs import FilterPipelineMessageV1, FilterPipelineMessageV2
 from zh5.dtypes import DatatypeMessage, FloatDatatype, VLStringDatatype, FixedPointDatatype
 from zh5.tree import BtreeV1Chunk
-from zh5.remote import HTTPRangeReader
+from zh5.scheduler import PRIORITY_INTERACTIVE, IOScheduler
+from zh5.remote import RETRY_STATUSES, HTTPRangeReader, RetryPolicy, default_pool, is_remote, split_multirange_response
+
+# chunks at most this many bytes apart are read with a single HTTP request
+DEFAULT_COALESCE_GAP = 4096
+DEFAULT_MAX_REQUEST_SIZE = 16 * 2 ** 20
+# maximum number of ranges in one multi-range request, servers limit the size of the Range header
+DEFAULT_MAX_RANGES = 64
+# maximum number of buffers of a preadv call
+try:
+    IOV_MAX = max(os.sysconf("SC_IOV_MAX"), 0) or 1024  # -1 if indeterminate
+except (AttributeError, ValueError, OSError):  # no sysconf on Windows
+    IOV_MAX = 1024
 
 
 class DataLayoutMessageV1V2:
@@ -75,6 +91,38 @@ class DataspaceMessage:
         return self._shape
 
 
+class FillValueMessage:
+    def __init__(self, file, offset):
+        self._f = file
+        self._o = offset
+
+        self._f.seek(self._o)
+        byts = self._f.read(4)
+        self._version = byts[0]
+        if self._version in (1, 2):
+            defined = self._version == 1 or byts[3] != 0  # 0: undefined, 1: library default, 2: user defined
+        elif self._version == 3:
+            defined = bool(byts[1] & 0x20)
+            self._f.seek(self._o + 2)
+        else:
+            raise ValueError(f"Unknown fill value message version {self._version}.")
+
+        self._value = None
+        if defined:
+            size = int.from_bytes(self._f.read(4), "little")
+            if size:
+                self._value = bytes(self._f.read(size))
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def value(self):
+        """Raw bytes of the fill value, None if zeros."""
+        return self._value
+
+
 class Dataset:
     def __init__(self, file, do, name=None, dataspace=None, dtype=None):
         self._f = file
@@ -109,6 +157,19 @@ class Dataset:
                     break
         return self._dataspace
 
+    def _read_fill_value(self):
+        """Fill value of the dataset as a scalar of its dtype, None if zeros."""
+        for m in self._do.msgs():
+            if m["type"] == 0x0005:
+                value = FillValueMessage(self._f, m["offset"]).value
+                if value is None:
+                    return None
+                dtype = np.dtype(self.dtype)
+                if len(value) != dtype.itemsize:
+                    raise NotImplementedError(f"Fill value of {len(value)} bytes for dtype {dtype}.")
+                return np.frombuffer(value, dtype=dtype)[0]
+        return None
+
     @property
     def dtype(self):
         if self._dtype is None:
@@ -143,6 +204,27 @@ class Dataset:
     def __getitem__(self, item):
         raise NotImplementedError
 
+    async def read_async(self, selection=slice(None)):
+        """Awaitable counterpart of `self[selection]`."""
+        raise NotImplementedError
+
+    def read_direct(self, out, source_sel=None, dest_sel=None):
+        """Reads `self[source_sel]` into `out[dest_sel]`, e.g. a preallocated array in shared memory or a np.memmap,
+        without allocating the result. Both selections default to everything."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _dest_view(out, dest_sel, shape):
+        """The view of `out` written by read_direct, with the shape of the source selection."""
+        view = out if dest_sel is None else out[dest_sel]
+        if not np.may_share_memory(view, out):
+            raise ValueError("dest_sel must select a view of out, use slices and integers only.")
+        if view.shape != shape:
+            if tuple(n for n in view.shape if n != 1) != tuple(n for n in shape if n != 1):
+                raise ValueError(f"Cannot read a selection of shape {shape} into one of shape {view.shape}.")
+            view = view.reshape(shape)  # only adds or drops dimensions of size 1, still a view
+        return view
+
     def _normalize_slice(self, s, dim):
         return slice(s.start or 0, s.stop or self.shape[dim], s.step or 1)
 
@@ -193,10 +275,9 @@ class ContiguousDataset(Dataset):
 
         normalized_slice = self._normalize_hyperslab(item)
         if self._dtype.is_memmap:
-            if self._f.name.startswith("https://"): # ToDo
-                fremote = HTTPRangeReader(self._f.raw_name)
-                fremote.seek(self._f.project_chunk(self._address))
-                buff = fremote.read(self._size)
+            if is_remote(self._f.name):
+                fremote = HTTPRangeReader(self._f.raw_name, pool=self._f.pool, retry=self._f.retry)
+                buff = fremote.read_range(self._f.project_chunk(self._address), self._size)
                 fremote.close()
                 arr = np.frombuffer(buff, self.dtype).reshape(self.shape)
                 return arr[tuple(normalized_slice)]
@@ -223,6 +304,21 @@ class ContiguousDataset(Dataset):
             arr = np.vectorize(self._dtype.parse)(heap_arr)
             return arr
 
+    def read_direct(self, out, source_sel=None, dest_sel=None):
+        arr = self[slice(None) if source_sel is None else source_sel]  # a view of the file, or of the response
+        self._dest_view(out, dest_sel, arr.shape)[...] = arr
+
+    async def read_async(self, selection=slice(None)):
+        if not (is_remote(self._f.name) and self._dtype.is_memmap):
+            return await asyncio.to_thread(self.__getitem__, selection)  # blocking reads, off the event loop
+        if self.address is None:
+            raise ValueError(f"Uninitialized array: {self.name}.")
+
+        reader = HTTPChunkReader(self._f.raw_name, self, pool=self._f.pool, retry=self._f.retry)
+        buff = await reader.read_range_async(self._f.async_session(), self._f.project_chunk(self._address), self._size)
+        arr = np.frombuffer(buff, self.dtype).reshape(self.shape)
+        return arr[self._normalize_hyperslab(selection)]
+
     @property
     def address(self):
         if self._address == self._f.undefined_address:
@@ -231,92 +327,598 @@ class ContiguousDataset(Dataset):
         return self._address
 
 
+_scratch = threading.local()
+
+
+def scratch_buffer(nbytes):
+    """Per-thread buffer of `nbytes` bytes reused by the chunk decodes of the thread, valid until its next call."""
+    buf = getattr(_scratch, "buf", None)
+    if buf is None or buf.nbytes != nbytes:
+        buf = _scratch.buf = np.empty(nbytes, dtype="u1")
+    return buf
+
+
+class ChunkIndex:
+    """Stored chunks of a dataset as NumPy arrays sorted by key, the row-major linear index of a chunk in the chunk
+    grid. Ranges of keys whose stored chunks are all in the index, those of the b-tree leaves read, are remembered
+    too, or all of them once the index is complete."""
+
+    def __init__(self, shape, chunkshape):
+        self._chunkshape = np.array(chunkshape, dtype=np.int64)
+        self._grid = tuple(int(n) for n in -(-np.array(shape, dtype=np.int64) // self._chunkshape))
+        ndim = len(self._grid)
+        self._strides = [int(np.prod(self._grid[i + 1:], dtype=np.int64)) for i in range(ndim)]
+
+        self._keys = np.empty(0, dtype=np.int64)
+        self._chunk_offsets = np.empty((0, ndim), dtype=np.int64)
+        self._addresses = np.empty(0, dtype=np.int64)
+        self._sizes = np.empty(0, dtype=np.int64)
+        self._filter_masks = np.empty(0, dtype=np.uint32)
+        # sorted disjoint [start, stop) key ranges known
+        self._known_starts = np.empty(0, dtype=np.int64)
+        self._known_stops = np.empty(0, dtype=np.int64)
+        self._complete = False
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def nchunks(self):
+        """Number of chunks in the grid, stored or not."""
+        return int(np.prod(self._grid, dtype=np.int64))
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def chunk_offsets(self):
+        """Offsets of the chunks in dataset coordinates, shape (len(self), ndim)."""
+        return self._chunk_offsets
+
+    @property
+    def addresses(self):
+        return self._addresses
+
+    @property
+    def sizes(self):
+        return self._sizes
+
+    @property
+    def filter_masks(self):
+        return self._filter_masks
+
+    @property
+    def complete(self):
+        return self._complete
+
+    def linear(self, chunk_offsets):
+        """Keys of chunk offsets in dataset coordinates, an array of shape (N, ndim)."""
+        return np.ravel_multi_index(tuple((np.asarray(chunk_offsets) // self._chunkshape).T), self._grid)
+
+    def rank(self, chunk_offset):
+        """Number of keys before a chunk offset in lexicographic order, its key if it is in the grid. B-tree keys may
+        be past the end of the grid."""
+        rank = 0
+        for offset, size, n, stride in zip(chunk_offset, self._chunkshape.tolist(), self._grid, self._strides):
+            if offset // size >= n:
+                return rank + n * stride
+            rank += offset // size * stride
+        return rank
+
+    def unknown(self, keys):
+        """Mask of the `keys` outside the known ranges."""
+        if self._complete:
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self._known_stops, keys, side="right")
+        known = pos < len(self._known_stops)
+        known[known] = self._known_starts[pos[known]] <= keys[known]
+        return ~known
+
+    def add(self, chunk_offsets, addresses, sizes, filter_masks, known=(), complete=False):
+        """Adds stored chunks, and the (start, stop) key ranges `known` that hold no other, or every chunk if
+        `complete`. Chunks already in the index are kept."""
+        chunk_offsets = np.asarray(chunk_offsets, dtype=np.int64).reshape(-1, len(self._grid))
+        inside = np.all(chunk_offsets // self._chunkshape < np.array(self._grid), axis=1)  # left by a shrink
+        keys = self.linear(chunk_offsets[inside])
+        order = np.argsort(keys, kind="stable")  # usually sorted already, in b-tree order
+        keys = keys[order]
+
+        # merge the new keys into the sorted ones, with a copy of the arrays instead of sorting them again
+        new = np.ones(len(keys), dtype=bool)
+        new[1:] = keys[1:] != keys[:-1]
+        pos = np.searchsorted(self._keys, keys)
+        if len(self._keys):
+            new &= self._keys[np.minimum(pos, len(self._keys) - 1)] != keys
+        pos, order = pos[new], order[new]
+        self._keys = np.insert(self._keys, pos, keys[new])
+        self._chunk_offsets = np.insert(self._chunk_offsets, pos, chunk_offsets[inside][order], axis=0)
+        self._addresses = np.insert(self._addresses, pos, np.asarray(addresses, dtype=np.int64)[inside][order])
+        self._sizes = np.insert(self._sizes, pos, np.asarray(sizes, dtype=np.int64)[inside][order])
+        self._filter_masks = np.insert(self._filter_masks, pos,
+                                       np.asarray(filter_masks, dtype=np.uint32)[inside][order])
+
+        self._complete = self._complete or complete
+        if not self._complete and len(known):
+            self._add_known(np.array(known, dtype=np.int64).reshape(-1, 2))
+
+    def _add_known(self, ranges):
+        starts = np.concatenate([self._known_starts, ranges[:, 0]])
+        stops = np.concatenate([self._known_stops, ranges[:, 1]])
+        order = np.argsort(starts, kind="stable")
+        starts, stops = starts[order], stops[order]
+        nonempty = stops > starts
+        starts, stops = starts[nonempty], stops[nonempty]
+        if len(starts) == 0:
+            return
+
+        # a range begins a merged one unless it starts before the ranges before it stop
+        first = np.ones(len(starts), dtype=bool)
+        first[1:] = starts[1:] > np.maximum.accumulate(stops)[:-1]
+        first = np.flatnonzero(first)
+        self._known_starts = starts[first]
+        self._known_stops = np.maximum.reduceat(stops, first)
+
+    def lookup(self, keys):
+        """Returns the positions in the arrays of the stored chunks among `keys`, and a mask of the stored keys."""
+        if len(self._keys) == 0:
+            return np.empty(0, dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        stored = self._keys[pos] == keys
+        return pos[stored], stored
+
+
+class ChunkScatter:
+    """Copies the intersection of decoded chunks with `hyperslab`, a tuple of slices with positive steps, into `out`,
+    from the threads decoding them. A chunk entirely inside the hyperslab, whose region in `out` is contiguous with the
+    dtype of the dataset, is decoded straight into `out`, the others into a scratch buffer of the thread."""
+
+    def __init__(self, out, hyperslab, chunkshape, dtype):
+        self._out = out
+        self._hyperslab = tuple(hyperslab)
+        self._chunkshape = tuple(chunkshape)
+        self._dtype = np.dtype(dtype)
+        self._chunk_nbytes = int(np.prod(self._chunkshape)) * self._dtype.itemsize
+
+        # per axis, chunk offset -> (destination, source) slices, computed for all the touched chunks at once
+        self._axes = []
+        for s, size in zip(self._hyperslab, self._chunkshape):
+            offsets = _axis_chunks(s.start, s.stop, s.step, size) * size
+            first = s.start + np.maximum(0, -((s.start - offsets) // s.step)) * s.step  # first selected in chunk
+            n = (np.minimum(s.stop, offsets + size) - first - 1) // s.step + 1
+            dest = (first - s.start) // s.step
+            src = first - offsets
+            self._axes.append({o: (slice(d, d + k), slice(r, r + (k - 1) * s.step + 1, s.step))
+                               for o, d, k, r in zip(offsets.tolist(), dest.tolist(), n.tolist(), src.tolist())})
+
+    @property
+    def out(self):
+        return self._out
+
+    def region(self, chunk_offset):
+        """Returns the (destination, source) slices of a chunk in `out` and in the chunk, None if they do not meet."""
+        regions = [axis.get(int(offset)) for axis, offset in zip(self._axes, chunk_offset)]
+        if None in regions:
+            return None
+        return tuple(dest for dest, _ in regions), tuple(src for _, src in regions)
+
+    def target(self, chunk_offset):
+        """The bytes of the region of a chunk in `out` if the chunk can be decoded into them, or else None."""
+        dest, src = self.region(chunk_offset)
+        if any(sl.step != 1 or sl.stop - sl.start != n for sl, n in zip(src, self._chunkshape)):
+            return None
+        region = self._out[dest]
+        if region.dtype == self._dtype and region.flags.c_contiguous:
+            return region.reshape(-1).view("u1")
+        return None
+
+    def write(self, chunk_offset, buf):
+        dest, src = self.region(chunk_offset)
+        arr = np.frombuffer(buf, self._dtype, count=int(np.prod(self._chunkshape))).reshape(self._chunkshape)
+        self._out[dest] = arr[src]
+
+    def decode(self, pipeline, chunk, byts):
+        """Decodes a chunk into its region, returns (chunk offset, None) like the chunk readers with a scatter."""
+        target = self.target(chunk["chunk_offset"])
+        if pipeline is None:
+            self.write(chunk["chunk_offset"], byts)
+        elif target is not None:
+            pipeline.decode(byts, chunk["filter_mask"], out=target)
+        else:
+            self.write(chunk["chunk_offset"],
+                       pipeline.decode(byts, chunk["filter_mask"], out=scratch_buffer(self._chunk_nbytes)))
+        return chunk["chunk_offset"], None
+
+
 class LocalChunkReader:
-    def __init__(self, fname, dataset):
-        self._fname = fname
+    """Reads chunks with positional reads on the raw descriptor of `file`, in byte offset order with a single preadv
+    for each run of adjacent chunks, and decodes them in parallel, on the long-lived threads of `scheduler` (zlib and
+    most numcodecs codecs release the GIL) or on `executor` if given, e.g. a ProcessPoolExecutor."""
+
+    def __init__(self, file, dataset, scheduler=None, executor=None):
+        self._f = file
         self._dataset = dataset
+        self._scheduler = scheduler if scheduler is not None else IOScheduler(os.cpu_count() or 1)
+        self._executor = executor
 
-    def fetch_chunks(self, chunks):
-        results = []
-        with open(self._fname, "rb") as f:
-            for chunk in chunks:
-                f.seek(chunk["byte_offset"])
-                byts = f.read(chunk["byte_length"])
-                if self._dataset.filter_pipeline:
-                    filters = list(self._dataset.filter_pipeline.filters())
-                    for filt in filters[::-1]:
-                        byts = filt.decode(byts)
-                results.append((chunk["chunk_offset"], byts))
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def executor(self):
+        return self._executor
+
+    def _read_run(self, fd, run):
+        buffers = [bytearray(chunk["byte_length"]) for chunk in run]
+        _preadv_full(fd, buffers, run[0]["byte_offset"])  # the chunks of a run are adjacent
+        return buffers
+
+    def _read(self, runs):
+        if not hasattr(os, "pread"):  # Windows
+            with open(self._f.raw_name, "rb") as f:
+                for run in runs:
+                    for chunk in run:
+                        f.seek(chunk["byte_offset"])
+                        byts = f.read(chunk["byte_length"])
+                        if len(byts) < chunk["byte_length"]:
+                            raise ValueError(f"Truncated file, chunk at byte {chunk['byte_offset']} ends past its end.")
+                        yield chunk, byts
+            return
+
+        fd = self._f.raw_fileno()
+        if hasattr(os, "posix_fadvise"):  # start the readahead of every run before waiting for the first one
+            for run in runs:
+                frm, length = _group_range(run)
+                os.posix_fadvise(fd, frm, length, os.POSIX_FADV_WILLNEED)
+        for run in runs:
+            yield from zip(run, self._read_run(fd, run))
+
+    def fetch_chunks(self, chunks, priority=PRIORITY_INTERACTIVE, scatter=None):
+        """Yields (chunk offset, decoded buffer) as chunks are decoded, or (chunk offset, None) once written into
+        `scatter` if given, a ChunkScatter."""
+        pipeline = self._dataset.pipeline
+        runs = coalesce_chunks(chunks, max_gap=0, max_size=DEFAULT_MAX_REQUEST_SIZE)  # sorted by byte offset
+
+        futures = {}  # future -> chunk
+        for chunk, byts in self._read(runs):
+            if pipeline is None:
+                if scatter is None:
+                    yield chunk["chunk_offset"], byts
+                else:
+                    yield scatter.decode(None, chunk, byts)
+                continue
+
+            if self._executor is not None:  # in another process, cannot write into `scatter`
+                future = self._executor.submit(pipeline.decode, byts, chunk["filter_mask"])
+            elif scatter is not None:
+                future = self._scheduler.submit(scatter.decode, pipeline, chunk, byts, priority=priority,
+                                                size=chunk["byte_length"])
+            else:
+                future = self._scheduler.submit(pipeline.decode, byts, chunk["filter_mask"], priority=priority,
+                                                size=chunk["byte_length"])
+            futures[future] = chunk
+
+        for future in concurrent.futures.as_completed(futures):
+            chunk = futures[future]
+            if scatter is not None and self._executor is not None:
+                scatter.write(chunk["chunk_offset"], future.result())
+                yield chunk["chunk_offset"], None
+            elif scatter is not None:
+                yield future.result()
+            else:
+                yield chunk["chunk_offset"], future.result()
+
+
+def client_session(pool):
+    """aiohttp session with the connection limit and timeout of `pool`, to be closed by the caller."""
+    # https://github.com/aio-libs/aiohttp/issues/1925#issuecomment-2030109671
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit_per_host=pool.maxsize, enable_cleanup_closed=True),
+        timeout=aiohttp.ClientTimeout(sock_connect=pool.timeout, sock_read=pool.timeout))
+
+
+def _axis_chunks(start, stop, step, chunk):
+    """Indices of the chunks that `range(start, stop, step)` touches along an axis of chunks of size `chunk`."""
+    if stop <= start:
+        return np.empty(0, dtype=np.int64)
+    if step <= chunk:  # every chunk between the first and the last selected index holds one
+        return np.arange(start // chunk, (start + (stop - start - 1) // step * step) // chunk + 1, dtype=np.int64)
+    return np.arange(start, stop, step, dtype=np.int64) // chunk  # one selected index per chunk at most
+
+
+def coalesce_chunks(chunks, max_gap=DEFAULT_COALESCE_GAP, max_size=DEFAULT_MAX_REQUEST_SIZE):
+    """Groups chunks whose byte ranges are at most `max_gap` bytes apart, each group spanning at most `max_size`
+    bytes (a single chunk larger than `max_size` is a group of its own). Returns a list of lists of chunks."""
+    if max_gap is None:
+        return [[chunk] for chunk in chunks]
+
+    groups = []
+    group_start, group_end = None, None
+    for chunk in sorted(chunks, key=lambda c: c["byte_offset"]):
+        start, end = chunk["byte_offset"], chunk["byte_offset"] + chunk["byte_length"]
+        if groups and start - group_end <= max_gap and max(end, group_end) - group_start <= max_size:
+            groups[-1].append(chunk)
+            group_end = max(end, group_end)
+        else:
+            groups.append([chunk])
+            group_start, group_end = start, end
+
+    return groups
+
+
+def _preadv_full(fd, buffers, offset):
+    """Fills `buffers` with the bytes from `offset` on, continuing after short reads, raises ValueError at the end of
+    the file."""
+    views = [memoryview(buf) for buf in buffers]
+    i, n = 0, 0
+    while True:
+        while i < len(views) and n >= len(views[i]):  # the buffers filled by the last read
+            n -= len(views[i])
+            i += 1
+        if i == len(views):
+            return
+        views[i] = views[i][n:]
+
+        if hasattr(os, "preadv"):
+            n = os.preadv(fd, views[i:i + IOV_MAX], offset)  # the system limits the buffers of a call
+        else:
+            byts = os.pread(fd, len(views[i]), offset)
+            n = len(byts)
+            views[i][:n] = byts
+        if n == 0:
+            raise ValueError(f"Truncated file, {sum(map(len, views[i:]))} bytes missing at byte {offset}.")
+        offset += n
+
+
+def _group_range(group):
+    frm = group[0]["byte_offset"]
+    to = max(c["byte_offset"] + c["byte_length"] for c in group)
+    return frm, to - frm
 
-        return results
+
+def _split_group(group, byts):
+    """Splits the response of a coalesced request back into the buffers of each chunk."""
+    group_start = group[0]["byte_offset"]
+    for chunk in group:
+        frm = chunk["byte_offset"] - group_start
+        yield chunk, byts[frm:frm + chunk["byte_length"]]
 
 
 class HTTPChunkReader:
-    def __init__(self, fname, dataset):
+    def __init__(self, fname, dataset, pool=None, max_gap=DEFAULT_COALESCE_GAP,
+                 max_request_size=DEFAULT_MAX_REQUEST_SIZE, multirange=False, max_ranges=DEFAULT_MAX_RANGES,
+                 retry=None):
         self._url = fname
         self._dataset = dataset
+        self._pool = pool if pool is not None else default_pool()
+        self._max_gap = max_gap
+        self._max_request_size = max_request_size
+        self._multirange = multirange
+        self._max_ranges = max_ranges
+        self._retry = retry if retry is not None else RetryPolicy()
+        self._latencies = collections.deque(maxlen=1000)
+        self._requests_saved = 0
+        self._retries = 0
+        self._hedges = 0
+        self._last_read_stats = {}
 
-    async def fetch_chunk(self, session, chunk_id, frm, length):
-        headers = {'Range': f'bytes={frm}-{frm + length}'}
-        async with session.get(self._url, headers=headers) as response:
-            byts = await response.read()
-            if self._dataset.filter_pipeline:
-                filters = list(self._dataset.filter_pipeline.filters())
-                for f in filters[::-1]:
-                    byts = f.decode(byts)
-
-        return chunk_id, byts
+    @property
+    def requests_saved(self):
+        return self._requests_saved
 
-    async def fetch_chunks_async(self, chunks):
-        # https://github.com/aio-libs/aiohttp/issues/1925#issuecomment-2030109671
-        async with aiohttp.ClientSession(
-                connector=aiohttp.TCPConnector(limit=20, force_close=True, enable_cleanup_closed=True)) as session:
-            tasks = [
-                self.fetch_chunk(session, chunk["chunk_offset"], chunk["byte_offset"], chunk["byte_length"])
-                for chunk in chunks]
-            results = await asyncio.gather(*tasks)
+    @property
+    def retries(self):
+        return self._retries
 
-        # # https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
-        # # https://github.com/aio-libs/aiohttp/issues/1925
-        # await asyncio.sleep(0.250)
+    @property
+    def hedges(self):
+        return self._hedges
 
-        return results
+    @property
+    def last_read_stats(self):
+        """Retries and hedged requests of the last fetch_chunks."""
+        return self._last_read_stats
+
+    async def _request(self, session, headers, partial=False):
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                async with session.get(self._url, headers=headers) as response:
+                    response.raise_for_status()
+                    if partial and response.status == 200:  # the whole object, dropped with the connection
+                        response.close()
+                        return response.status, response.headers, None
+                    byts = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = e.status if isinstance(e, aiohttp.ClientResponseError) else None
+                if attempt >= self._retry.retries or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                self._retries += 1
+                await asyncio.sleep(self._retry.delay(attempt))
+                attempt += 1
+                continue
+
+            self._latencies.append(time.monotonic() - start)
+            return response.status, response.headers, byts
+
+    async def _get(self, session, headers, partial=False):
+        """A GET with retries, hedged by a second identical request if the first one is slower than usual."""
+        delay = self._retry.hedge_delay(self._latencies)
+        if delay is None:
+            return await self._request(session, headers, partial)
+
+        tasks = [asyncio.ensure_future(self._request(session, headers, partial))]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            self._hedges += 1
+            tasks.append(asyncio.ensure_future(self._request(session, headers, partial)))
+
+        pending = tasks
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+            if not pending:
+                return done.pop().result()
+
+    def _decode(self, byts, filter_mask=0):
+        if self._dataset.pipeline is None:
+            return byts
+        return self._dataset.pipeline.decode(byts, filter_mask)
+
+    def _decode_all(self, chunk_buffers):
+        return [(chunk["chunk_offset"], self._decode(buf, chunk["filter_mask"])) for chunk, buf in chunk_buffers]
+
+    async def _decode_async(self, chunk_buffers):
+        """Decodes the (chunk, buffer) pairs in a worker thread, decompressing on the event loop would block it."""
+        chunk_buffers = list(chunk_buffers)
+        if self._dataset.pipeline is None:
+            return [(chunk["chunk_offset"], buf) for chunk, buf in chunk_buffers]
+        return await asyncio.to_thread(self._decode_all, chunk_buffers)
+
+    async def fetch_chunk(self, session, chunk_id, frm, length, filter_mask=0):
+        headers = {'Range': f'bytes={frm}-{frm + length - 1}'}
+        _, _, byts = await self._get(session, headers)
+
+        return chunk_id, await asyncio.to_thread(self._decode, byts, filter_mask)
+
+    async def fetch_group(self, session, group):
+        frm, length = _group_range(group)
+        headers = {'Range': f'bytes={frm}-{frm + length - 1}'}
+        _, _, byts = await self._get(session, headers)
+
+        return await self._decode_async(_split_group(group, byts))
+
+    async def fetch_batch(self, session, groups):
+        if not self._multirange or len(groups) < 2:
+            results = await asyncio.gather(*[self.fetch_group(session, group) for group in groups])
+            return [result for group_results in results for result in group_results]
+
+        ranges = [_group_range(group) for group in groups]
+        headers = {'Range': "bytes=" + ",".join(f"{frm}-{frm + length - 1}" for frm, length in ranges)}
+        status, response_headers, byts = await self._get(session, headers, partial=True)
+        buffers = split_multirange_response(status, response_headers, byts, ranges)
+
+        if buffers is None:  # the server does not support multi-range requests
+            self._multirange = False
+            return await self.fetch_batch(session, groups)
+
+        self._requests_saved += len(groups) - 1
+        return await self._decode_async(pair for group, group_buffer in zip(groups, buffers)
+                                        for pair in _split_group(group, group_buffer))
+
+    async def read_range_async(self, session, offset, size):
+        _, _, byts = await self._get(session, {'Range': f'bytes={offset}-{offset + size - 1}'})
+        return byts
+
+    async def fetch_chunks_async(self, chunks, session=None):
+        """Fetches and decodes `chunks`, with `session` if given, or else a session of its own closed at the end."""
+        if session is None:
+            async with client_session(self._pool) as session:
+                return await self.fetch_chunks_async(chunks, session)
+
+        retries, hedges = self._retries, self._hedges
+        groups = coalesce_chunks(chunks, self._max_gap, self._max_request_size)
+        self._requests_saved += len(chunks) - len(groups)
+        batches = [groups[i:i + self._max_ranges] for i in range(0, len(groups), self._max_ranges)]
+        results = await asyncio.gather(*[self.fetch_batch(session, batch) for batch in batches])
+
+        self._last_read_stats = {"retries": self._retries - retries, "hedges": self._hedges - hedges}
+        return [result for batch_results in results for result in batch_results]
 
     def fetch_chunks(self, chunks):
         return asyncio.run(self.fetch_chunks_async(chunks))
 
 
 class HTTPThreadedChunkReader:
-    def __init__(self, fname, dataset):
+    def __init__(self, fname, dataset, pool=None, max_gap=DEFAULT_COALESCE_GAP,
+                 max_request_size=DEFAULT_MAX_REQUEST_SIZE, multirange=False, max_ranges=DEFAULT_MAX_RANGES,
+                 retry=None, scheduler=None):
         self._url = fname
         self._dataset = dataset
+        # shares the keep-alive connections of the metadata reader when both use the same pool
+        self._reader = HTTPRangeReader(fname, pool=pool, multirange=multirange, retry=retry)
+        self._scheduler = scheduler if scheduler is not None else IOScheduler(self._reader.pool.maxsize)
+        self._max_gap = max_gap
+        self._max_request_size = max_request_size
+        self._max_ranges = max_ranges
+        self._requests_saved = 0
+        self._last_read_stats = {}
+
+    @property
+    def requests_saved(self):
+        return self._requests_saved
 
-    def fetch_chunk(self, chunk_id, frm, length):
-        headers = {'Range': f'bytes={frm}-{frm + length}'}
-        req = urllib.request.Request(self._url, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            byts = response.read()
+    @property
+    def scheduler(self):
+        return self._scheduler
 
-            if self._dataset.filter_pipeline:
-                filters = list(self._dataset.filter_pipeline.filters())
-                for f in filters[::-1]:
-                    byts = f.decode(byts)
+    @property
+    def retries(self):
+        return self._reader.retries
 
-        return chunk_id, byts
+    @property
+    def hedges(self):
+        return self._reader.hedges
 
-    def fetch_chunks(self, chunks):
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-            future_to_offset = {
-                executor.submit(
-                    self.fetch_chunk,
-                    c["chunk_offset"],
-                    c["byte_offset"],
-                    c["byte_length"]): c["chunk_offset"]
-                for c in chunks}
-
-            for future in concurrent.futures.as_completed(future_to_offset):
-                offset = future_to_offset[future]
-                yield future.result()
+    @property
+    def last_read_stats(self):
+        """Retries and hedged requests of the last fetch_chunks."""
+        return self._last_read_stats
+
+    def _decode(self, byts, filter_mask=0):
+        if self._dataset.pipeline is None:
+            return byts
+        return self._dataset.pipeline.decode(byts, filter_mask)
+
+    def fetch_chunk(self, chunk_id, frm, length, filter_mask=0):
+        return chunk_id, self._decode(self._reader.read_range(frm, length), filter_mask)
+
+    def fetch_group(self, group):
+        byts = self._reader.read_range(*_group_range(group))
+
+        return [(chunk["chunk_offset"], self._decode(buf, chunk["filter_mask"]))
+                for chunk, buf in _split_group(group, byts)]
+
+    def fetch_batch(self, groups, scatter=None):
+        multirange = self._reader.multirange
+        buffers = self._reader.read_ranges([_group_range(group) for group in groups])
+        if multirange and self._reader.multirange:
+            self._requests_saved += len(groups) - 1
+
+        if scatter is not None:
+            return [scatter.decode(self._dataset.pipeline, chunk, buf)
+                    for group, group_buffer in zip(groups, buffers)
+                    for chunk, buf in _split_group(group, group_buffer)]
+        return [(chunk["chunk_offset"], self._decode(buf, chunk["filter_mask"]))
+                for group, group_buffer in zip(groups, buffers)
+                for chunk, buf in _split_group(group, group_buffer)]
+
+    def fetch_chunks(self, chunks, priority=PRIORITY_INTERACTIVE, scatter=None):
+        """Yields (chunk offset, decoded buffer) as chunks are decoded, or (chunk offset, None) once written into
+        `scatter` if given, a ChunkScatter."""
+        retries, hedges = self.retries, self.hedges
+        groups = coalesce_chunks(chunks, self._max_gap, self._max_request_size)
+        self._requests_saved += len(chunks) - len(groups)
+        logging.debug(f"Coalesced {len(chunks)} chunks into {len(groups)} HTTP requests.")
+
+        if self._reader.multirange:
+            batches = [groups[i:i + self._max_ranges] for i in range(0, len(groups), self._max_ranges)]
+        else:
+            batches = [[group] for group in groups]
+
+        futures = [self._scheduler.submit(self.fetch_batch, batch, scatter, priority=priority,
+                                          size=sum(_group_range(group)[1] for group in batch))
+                   for batch in batches]
+        for future in concurrent.futures.as_completed(futures):
+            yield from future.result()
+
+        self._last_read_stats = {"retries": self.retries - retries, "hedges": self.hedges - hedges}
 
 
 class ChunkedDataset(Dataset):
@@ -340,19 +942,33 @@ class ChunkedDataset(Dataset):
 
         self._filter_pipeline = None
         self._btree = None
-
-        # init the btree chunk cache
-        self._btree_idx = {}
-        for chunk in self.btree.inspect_chunks():
-            chunk_offset = chunk["chunk_offset"]
-            self._btree_idx[chunk_offset] = (chunk["offset"], chunk["length"])
-
-        # chunk reader
-        if self._f.name.startswith("http://") or self._f.name.startswith("https://"):
-            # self._cr = HTTPChunkReader(self._f.raw_name, self)
-            self._cr = HTTPThreadedChunkReader(self._f.raw_name, self)
+        self._validator = None  # of the file, in the keys of the chunk cache
+        # elements of the chunks never written, read once as reads run from several threads
+        self._fill_value = self._read_fill_value() if self._dtype.is_memmap else None
+
+        if self.filter_pipeline:  # read now, compiling the pipeline on the first decode reads nothing
+            for fd in self.filter_pipeline.filter_descriptions():
+                fd.client_data
+        # compiled once on the first decode, the chunk readers decode with it from several threads
+        self._pipeline = None
+        self._pipeline_lock = threading.Lock()
+
+        # chunks looked up so far, the b-tree is only read down to the chunks of each selection
+        self._index = ChunkIndex(self.shape, self.chunkshape)
+        self._btree_nodes = {}  # address -> BtreeV1Chunk node, every node read
+        self._index_lock = threading.Lock()  # reads from several threads look up chunks one at a time
+
+        # chunk reader, and the one of read_async, created on first use
+        self._acr = None
+        if is_remote(self._f.name):
+            self._cr = HTTPThreadedChunkReader(self._f.raw_name, self, pool=self._f.pool,
+                                               max_gap=self._f.coalesce_gap,
+                                               max_request_size=self._f.max_request_size,
+                                               multirange=self._f.multirange, retry=self._f.retry,
+                                               scheduler=self._f.scheduler)
         else:
-            self._cr = LocalChunkReader(self._f.raw_name, self)
+            self._cr = LocalChunkReader(self._f, self, scheduler=self._f.scheduler,
+                                        executor=self._f.decode_executor)
 
     @property
     def address(self):
@@ -365,19 +981,42 @@ class ChunkedDataset(Dataset):
     def chunkshape(self):
         return self._chunkshape
 
+    @property
+    def fill_value(self):
+        return self._fill_value
+
+    @property
+    def chunk_reader(self):
+        return self._cr
+
+    @property
+    def async_chunk_reader(self):
+        if self._acr is None:
+            self._acr = HTTPChunkReader(self._f.raw_name, self, pool=self._f.pool, max_gap=self._f.coalesce_gap,
+                                        max_request_size=self._f.max_request_size, multirange=self._f.multirange,
+                                        retry=self._f.retry)
+        return self._acr
+
     @property
     def itemsize(self):
         return self._itemsize
 
     @property
     def btree(self):
-        if self._btree is None:
-            for m in self._do.msgs():
-                if m["type"] == 8:
-                    self._btree = BtreeV1Chunk(self._f, self.address, self)
+        if self._btree is None and self.address is not None:
+            self._btree = BtreeV1Chunk(self._f, self.address, self)
 
         return self._btree
 
+    @property
+    def pipeline(self):
+        """The compiled filter pipeline, None without filters, raises ValueError for unsupported filters."""
+        if self._pipeline is None and self._filter_pipeline:
+            with self._pipeline_lock:
+                if self._pipeline is None:
+                    self._pipeline = self._filter_pipeline.compile(verify_checksums=self._f.verify_checksums)
+        return self._pipeline
+
     @property
     def filter_pipeline(self):
         if self._filter_pipeline is None:
@@ -409,80 +1048,161 @@ class ChunkedDataset(Dataset):
                     yield c
                     counter += 1
 
-    def get_chunk_coords(self, hyperslab):  # this returns linear projection
-        ndim = self.ndim
-        chunk_queue = [[None] * ndim]
+    def chunk_grid(self, hyperslab):
+        """Array of shape (number of chunks, ndim) with the indices of the chunks a hyperslab touches, in C order."""
+        axes = [_axis_chunks(s.start or 0, min(s.stop or n, n), s.step or 1, c)
+                for s, n, c in zip(hyperslab, self.shape, self.chunkshape)]
+        grid = np.meshgrid(*axes, indexing="ij")
+        return np.stack(grid, axis=-1).reshape(-1, self.ndim)
 
-        for dim in range(ndim):
-            start = hyperslab[dim].start or 0
-            stop = hyperslab[dim].stop or self.shape[dim]
-            step = hyperslab[dim].step or 1
-
-            for i in range(len(chunk_queue)):
-                chunk = chunk_queue.pop(0)
-                prev = None
-                for j in range(start, stop, step):
-                    c = chunk.copy()
-                    c[dim] = j // self.chunkshape[dim]
-                    if dim == ndim - 1:
-                        if prev is None or prev != c:
-                            prev = c
-                            yield tuple(c)
-                    elif not chunk_queue or c != chunk_queue[-1]:
-                        chunk_queue.append(c)
+    def get_chunk_coords(self, hyperslab):  # this returns linear projection
+        yield from map(tuple, self.chunk_grid(hyperslab).tolist())
 
     def get_chunk_coords_dataset_projection(self, hyperslab):
-        ndim = self.ndim
-        chunk_queue = [[None] * ndim]
+        yield from map(tuple, (self.chunk_grid(hyperslab) * np.array(self.chunkshape)).tolist())
+
+    @staticmethod
+    def _chunk_arrays(chunks):
+        chunks = list(chunks)
+        return ([c["chunk_offset"] for c in chunks], [c["offset"] for c in chunks], [c["length"] for c in chunks],
+                [c["filter_mask"] for c in chunks])
+
+    def _lookup_chunks(self, keys, chunk_offsets):
+        """Adds the chunks of `keys`, sorted, with offsets `chunk_offsets` to the chunk index."""
+        unknown = self._index.unknown(keys)
+        if not unknown.any():
+            return
+        if self.address is None:  # no b-tree before the first chunk is written
+            self._index.add([], [], [], [], known=[(0, self._index.nchunks)])
+            return
 
-        for dim in range(ndim):
-            start = hyperslab[dim].start or 0
-            stop = hyperslab[dim].stop or self.shape[dim]
-            step = hyperslab[dim].step or 1
+        if self._btree is None:
+            self._btree_nodes[self.address] = self.btree
+        # every chunk of the leaves on the way, their key ranges are then known
+        leaves = list(self.btree.find_leaves(list(map(tuple, chunk_offsets[unknown].tolist())), self._btree_nodes))
+        chunks = [np.concatenate(arrays) for arrays in zip(*(leaf.chunk_arrays() for leaf in leaves))]
+        root_first, root_last = self.btree.key_range  # no chunk outside the range of the root either
+        rank = self._index.rank
+        known = [(0, rank(root_first)), (rank(root_last), self._index.nchunks)] + \
+                [tuple(map(rank, leaf.key_range)) for leaf in leaves]
+        self._index.add(*(chunks or ([], [], [], [])), known=known)
+
+    def chunk_index(self):
+        """The ChunkIndex of all the chunks of the dataset, reading the whole b-tree the first time."""
+        with self._index_lock:
+            if not self._index.complete:
+                if self.address is None:
+                    self._index.add([], [], [], [], complete=True)
+                else:
+                    self._btree_nodes[self.address] = self.btree
+                    self._index.add(*self.btree.chunk_arrays(self._btree_nodes), complete=True)
+        return self._index
+
+    def _plan(self, normalized_hyperslab):
+        """Returns the stored chunks a hyperslab touches, and whether they are all stored."""
+        chunk_offsets = self.chunk_grid(tuple(normalized_hyperslab)) * np.array(self.chunkshape, dtype=np.int64)
+        keys = self._index.linear(chunk_offsets)  # sorted, the grid is in C order
+        with self._index_lock:
+            self._lookup_chunks(keys, chunk_offsets)
+            pos, stored = self._index.lookup(keys)
+            index = self._index
+            chunk_offsets, addresses, sizes, filter_masks = (index.chunk_offsets[pos], index.addresses[pos],
+                                                             index.sizes[pos], index.filter_masks[pos])
+
+        matched_chunks = [{"chunk_offset": tuple(chunk_offset),
+                           "byte_offset": self._f.project_chunk(address),
+                           "byte_length": size,
+                           "filter_mask": filter_mask}
+                          for chunk_offset, address, size, filter_mask in zip(chunk_offsets.tolist(),
+                                                                              addresses.tolist(),
+                                                                              sizes.tolist(),
+                                                                              filter_masks.tolist())]
+
+        return matched_chunks, bool(stored.all())
+
+    def _scatter(self, normalized_hyperslab, complete, out=None, dest_sel=None):
+        """A ChunkScatter into `out[dest_sel]` if given, or else into a new array of the shape of the hyperslab."""
+        hyperslab = [slice(s.start, min(s.stop, n), s.step) for s, n in zip(normalized_hyperslab, self.shape)]
+        shape = tuple(len(range(s.start, s.stop, s.step)) for s in hyperslab)
+        if out is None:
+            out = np.empty(shape, dtype=self.dtype)
+        else:
+            out = self._dest_view(out, dest_sel, shape)
+        if not complete:  # chunks never written are not stored
+            out[...] = 0 if self._fill_value is None else self._fill_value
+        return ChunkScatter(out, hyperslab, self.chunkshape, self.dtype)
+
+    def _assemble(self, normalized_hyperslab, complete, results):
+        scatter = self._scatter(normalized_hyperslab, complete)
+        for chunk_offset, chunk_buffer in results:
+            scatter.write(chunk_offset, chunk_buffer)
+
+        return scatter.out
+
+    def _cache_key(self, chunk_offset):
+        if self._validator is None:  # a cache shared by files must not serve chunks of a rewritten file
+            self._validator = self._f.validator
+        return self._f.raw_name, self._validator, self._address, chunk_offset
+
+    def _split_cached(self, chunks):
+        """Returns the (chunk offset, buffer) of the chunks in the file chunk cache, and the chunks missing from it."""
+        cache = self._f.chunk_cache
+        if cache is None:
+            return [], chunks
+
+        cached, missing = [], []
+        for chunk in chunks:
+            buf = cache.get(self._cache_key(chunk["chunk_offset"]))
+            if buf is None:
+                missing.append(chunk)
+            else:
+                cached.append((chunk["chunk_offset"], buf))
+        return cached, missing
+
+    def _cache_results(self, results):
+        cache = self._f.chunk_cache
+        for chunk_offset, buf in results:
+            if cache is not None:
+                cache.put(self._cache_key(chunk_offset), buf)
+            yield chunk_offset, buf
+
+    def _fetch_chunks(self, chunks):
+        cached, missing = self._split_cached(chunks)
+        yield from cached
+        if missing:
+            yield from self._cache_results(self._cr.fetch_chunks(missing))
+
+    def _read(self, item, out=None, dest_sel=None):
+        normalized_hyperslab = self._normalize_hyperslab(item)
+        chunks, complete = self._plan(normalized_hyperslab)
+        scatter = self._scatter(normalized_hyperslab, complete, out, dest_sel)
+        if self._f.chunk_cache is not None:  # keeps the decoded buffers
+            for chunk_offset, chunk_buffer in self._fetch_chunks(chunks):
+                scatter.write(chunk_offset, chunk_buffer)
+        else:  # the chunk readers decode into the output from their threads, without a buffer per chunk
+            for _ in self._cr.fetch_chunks(chunks, scatter=scatter):
+                pass
 
-            for i in range(len(chunk_queue)):
-                chunk = chunk_queue.pop(0)
-                prev = None
-                for j in range(start, stop, step):
-                    c = chunk.copy()
-                    c[dim] = (j // self.chunkshape[dim]) * self.chunkshape[dim]
-                    if dim == ndim - 1:
-                        if prev is None or prev != c:
-                            prev = c
-                            yield tuple(c)
-                    elif not chunk_queue or c != chunk_queue[-1]:
-                        chunk_queue.append(c)
+        return scatter.out
 
     def __getitem__(self, item):
-        normalized_hyperslab = self._normalize_hyperslab(item)
-
-        # get the chunks and fill the numpy array
-        chunks = np.array(list(self.get_chunk_coords_dataset_projection(tuple(normalized_hyperslab))))
-
-        # create array to store the data
-        padded_shape = tuple(chunks.max(axis=0, initial=0) -
-                             chunks.min(axis=0, initial=max(self.shape)) +
-                             np.array(self.chunkshape))
-        data = np.empty(padded_shape, dtype="f4")
-        chunk_origin = chunks.min(axis=0, initial=max(self.shape))
-
-        matched_chunks = []
-        for requested_chunk in chunks:
-            requested_chunk_tuple = tuple(requested_chunk)
-            if requested_chunk_tuple in self._btree_idx:
-                matched_chunks.append({
-                    "chunk_offset": requested_chunk_tuple,
-                    "byte_offset": self._f.project_chunk(self._btree_idx[requested_chunk_tuple][0]),
-                    "byte_length": self._btree_idx[requested_chunk_tuple][1]})
-
-        for chunk_offset, chunk_buffer in self._cr.fetch_chunks(matched_chunks):
-            chunk_arr = np.frombuffer(chunk_buffer, self.dtype).reshape(self.chunkshape)
-            chunk_vector = np.array(chunk_offset)
-            region = tuple([slice(i, i + j) for i, j in zip((chunk_vector - chunk_origin), self.chunkshape)])
-            data[region] = chunk_arr
-
-        # restrict the selection to the area requested by the user
-        region = tuple([slice(s.start - chunk_origin[i], s.stop - chunk_origin[i], s.step)
-                        for i, s in enumerate(normalized_hyperslab)])
-
-        return data[region]
+        return self._read(item)
+
+    def read_direct(self, out, source_sel=None, dest_sel=None):
+        self._read(slice(None) if source_sel is None else source_sel, out, dest_sel)
+
+    async def read_async(self, selection=slice(None)):
+        """Awaitable counterpart of `self[selection]`, remote chunks are fetched with the aiohttp session the file
+        keeps for the running event loop, so many reads can be in flight at once without threads."""
+        if not is_remote(self._f.name):  # blocking reads, off the event loop
+            return await asyncio.to_thread(self.__getitem__, selection)
+
+        normalized_hyperslab = self._normalize_hyperslab(selection)
+        # b-tree nodes are read with blocking requests, off the event loop
+        chunks, complete = await asyncio.to_thread(self._plan, normalized_hyperslab)
+        results, missing = self._split_cached(chunks)
+        if missing:
+            fetched = await self.async_chunk_reader.fetch_chunks_async(missing, self._f.async_session())
+            results += list(self._cache_results(fetched))
+
+        return await asyncio.to_thread(self._assemble, normalized_hyperslab, complete, results)
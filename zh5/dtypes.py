@@ -65,7 +65,7 @@ class FixedPointDatatype(Datatype):
 
     @property
     def dtype(self):
-        return f"{self._byte_order}i{self._m.size}"
+        return f"{self._byte_order}{'i' if self._signed else 'u'}{self._m.size}"
 
     @property
     def is_memmap(self):
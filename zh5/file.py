@@ -1,13 +1,28 @@
+import asyncio
+import concurrent.futures
 import logging
+import os
 import struct
-import urllib.request
+import threading
+import weakref
 from collections import OrderedDict
 
-from zh5.remote import HTTPRangeReader
+import numpy as np
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+from zh5.remote import DEFAULT_BLOCK_CACHE_SIZE, DEFAULT_HEAD_SIZE, HTTPRangeReader, RetryPolicy, default_pool, \
+    is_remote
 from zh5.attr import AttributeMessage
-from zh5.dataset import DataspaceMessage, DataLayoutMessageV3, ChunkedDataset, ContiguousDataset
+from zh5.cache import DiskPageCache, LRUCache, nbytes
+from zh5.dataset import DataspaceMessage, DataLayoutMessageV3, ChunkedDataset, ContiguousDataset, \
+    DEFAULT_COALESCE_GAP, DEFAULT_MAX_REQUEST_SIZE, client_session
 from zh5.heap import LocalHeap, GlobalHeap
 from zh5.link import LinkMessage, LinkInfoMessage, SimpleLink
+from zh5.scheduler import DEFAULT_MAX_IN_FLIGHT, PRIORITY_PREFETCH, IOScheduler
 from zh5.tree import BtreeV1Group
 
 SIGNATURE = b"\x89HDF\r\n\x1a\n"
@@ -35,6 +50,10 @@ class DriverInformationBlock:
 
 
 class Superblock:
+    @property
+    def offset(self):
+        return self._o
+
     @property
     def entrypoint(self):
         raise NotImplementedError
@@ -60,6 +79,10 @@ class Superblock:
     def undefined_address(self):
         return 2 ** (self.size_of_offsets * 8) - 1
 
+    @property
+    def end_of_file_address(self):
+        return self._end_of_file_address
+
     @property
     def group_leaf_node_k(self):
         raise ValueError(f"This version of the superblock (version={self.version}) does not support Group Leaf Node K.")
@@ -69,6 +92,10 @@ class Superblock:
         raise ValueError(
             f"This version of the superblock (version={self.version}) does not support Group Internal Node K.")
 
+    @property
+    def indexed_storage_internal_node_k(self):
+        return 32  # library default, other values are stored in the superblock extension
+
     @property
     def driver(self):
         raise NotImplementedError
@@ -145,6 +172,12 @@ class SuperblockV01(Superblock):
     def group_leaf_node_k(self):
         return self._group_leaf_node_k
 
+    @property
+    def indexed_storage_internal_node_k(self):
+        if self._version == 1:
+            return self._indexed_storage_internal_node_k
+        return super().indexed_storage_internal_node_k
+
     @property
     def driver(self):
         return self._driver_information_block
@@ -208,6 +241,9 @@ class FileReadStrategy:
     def tell(self):
         raise NotImplementedError
 
+    def close(self):
+        pass
+
 
 class SimpleFileReadStrategy(FileReadStrategy):
     def __init__(self, file):
@@ -223,22 +259,62 @@ class SimpleFileReadStrategy(FileReadStrategy):
         return self._f.tell()
 
 
+class MmapFileReadStrategy(FileReadStrategy):
+    """Reads are memoryview slices of a read-only memory map of the whole file, no system call nor copy per read."""
+
+    def __init__(self, file):
+        self._f = file
+        self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._pos = 0
+
+    def read(self, n):
+        frm = self._pos
+        self._pos = min(frm + n, len(self._view))
+        return self._view[frm:self._pos]
+
+    def seek(self, pos):
+        self._pos = pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            pass  # slices are still referenced by parsed objects, the map is closed when they are collected
+
+
 class PageFileReadStrategy(FileReadStrategy):
-    def __init__(self, file, page_size, pos):
+    def __init__(self, file, page_size, pos, cache_size=None, disk_cache=None, namespace=None):
         self._f = file
         self._page_size = page_size
 
         self._pos = pos
-        self._metadata_cache = {}
+        self._metadata_cache = LRUCache(cache_size)  # page id -> page bytes
+
+        # second level cache shared between processes, `namespace` identifies the file and its version
+        self._disk_cache = disk_cache
+        self._namespace = namespace
 
-        self._cache_hits = 0
-        self._cache_misses = 0
+        self._prefetched = set()  # prefetched page ids not requested yet
+        self._prefetch_hits = 0
+        self._prefetches = []  # futures of the background prefetch reads
+        self._pending = {}  # page id -> (future, first page id, number of pages) of the prefetch read not done yet
+        self._lock = threading.Lock()  # serializes the seek and read pairs without positional reads
 
     def read(self, n):
+        """Returns a memoryview of the cached page if the read is within one page, a new buffer otherwise."""
         page = self._pos // self._page_size  # page id of current byte position in the file
         page_offset = self._page_size * page  # page offset in the file of the page id
         byte_diff = self._pos - page_offset  # length from page offset in the file to current file offset
 
+        if byte_diff + n <= self._page_size:
+            self._pos += n
+            return self._get_page_data(page, byte_diff, byte_diff + n)
+
         buf = bytearray(n)
         pending = n
         frm_page = byte_diff
@@ -264,46 +340,172 @@ class PageFileReadStrategy(FileReadStrategy):
     def tell(self):
         return self._pos
 
-    def _read_page(self, pageid):
-        pos = self._page_size * pageid
-        back_to = self._f.tell()
-        self._f.seek(pos)
-        byts = self._f.read(self._page_size)
-        self._f.seek(back_to)
+    def _read_at(self, pos, n):
+        """Reads `n` bytes at `pos` without moving the file position, safe to call from several threads."""
+        if isinstance(self._f, HTTPRangeReader):
+            return self._f.read_range(pos, n)
+        if hasattr(os, "pread"):
+            return os.pread(self._f.fileno(), n, pos)
+        with self._lock:
+            back_to = self._f.tell()
+            self._f.seek(pos)
+            byts = self._f.read(n)
+            self._f.seek(back_to)
         return byts
 
-    def _get_page_data(self, pageid, frm, to):
-        if pageid not in self._metadata_cache:
-            self._cache_misses += 1
-            self._metadata_cache[pageid] = self._read_page(pageid)
+    def _read_page(self, pageid):
+        return self._read_at(self._page_size * pageid, self._page_size)
+
+    def _wait_prefetch(self, pageid):
+        """Waits for the prefetch read of `pageid` if one is running, or runs it now if it did not start yet."""
+        pending = self._pending.get(pageid)
+        if pending is None:
+            return
+        future, first, npages = pending
+        if future.cancel():
+            self._prefetch(first, npages)
         else:
-            self._cache_hits += 1
+            concurrent.futures.wait([future])
+
+    def _get_page(self, pageid):
+        if pageid in self._pending:  # read again otherwise, the prefetch counts as a hit
+            self._wait_prefetch(pageid)
+        page = self._metadata_cache.get(pageid)
+        if page is not None and pageid in self._prefetched:
+            self._prefetched.discard(pageid)
+            self._prefetch_hits += 1  # a cache miss avoided by the prefetch
+        elif page is None:
+            if self._disk_cache is not None:
+                page = self._disk_cache.get(self._namespace, pageid)
+            if page is None:
+                page = self._read_page(pageid)
+                if self._disk_cache is not None:
+                    self._disk_cache.put(self._namespace, pageid, page)
+            self._metadata_cache.put(pageid, page)
+
+        return page
 
-        return self._metadata_cache[pageid][frm:to]
+    def _get_page_data(self, pageid, frm, to):
+        return memoryview(self._get_page(pageid))[frm:to]
+
+    def prefetch(self, first, npages, scheduler, max_request_size=None):
+        """Reads `npages` pages from page id `first` into the cache in the background, with reads of at most
+        `max_request_size` bytes run by `scheduler` after the reads of higher priority."""
+        step = npages if max_request_size is None else max(1, max_request_size // self._page_size)
+        for start in range(first, first + npages, step):
+            n = min(step, first + npages - start)
+            future = scheduler.submit(self._prefetch, start, n, priority=PRIORITY_PREFETCH, size=self._page_size * n)
+            self._prefetches.append(future)
+            for pageid in range(start, start + n):
+                self._pending[pageid] = (future, start, n)
+
+    def _prefetch(self, first, npages):
+        try:
+            self.seed(first, self._read_at(self._page_size * first, self._page_size * npages))
+        finally:
+            for pageid in range(first, first + npages):
+                self._pending.pop(pageid, None)
+
+    def wait_prefetch(self, timeout=None):
+        """Waits for the background prefetch reads, returns True if they are all done."""
+        _, pending = concurrent.futures.wait(self._prefetches, timeout=timeout)
+        return not pending
+
+    def seed(self, first, byts, partial=True):
+        """Caches the pages in `byts`, which starts at page id `first`. A trailing partial page is cached only if
+        `partial` is set, i.e. `byts` ends at the end of the file."""
+        npages = len(byts) // self._page_size
+        if partial and len(byts) % self._page_size:
+            npages += 1
+
+        for i in range(npages):
+            pageid = first + i
+            if pageid in self._metadata_cache:
+                continue
+            page = bytes(byts[self._page_size * i:self._page_size * (i + 1)])
+            self._metadata_cache.put(pageid, page)
+            self._prefetched.add(pageid)
+            if self._disk_cache is not None and not self._disk_cache.contains(self._namespace, pageid):
+                self._disk_cache.put(self._namespace, pageid, page)
+
+    @property
+    def prefetch_hits(self):
+        return self._prefetch_hits
+
+    def pin(self, pos):
+        """Never evicts the page holding the byte at `pos`."""
+        self._metadata_cache.pin(pos // self._page_size)
 
     @property
     def cache_hits(self):
-        return self._cache_hits
+        return self._metadata_cache.hits
 
     @property
     def cache_misses(self):
-        return self._cache_misses
+        return self._metadata_cache.misses
+
+    @property
+    def cache_evictions(self):
+        return self._metadata_cache.evictions
+
+    @property
+    def cache_nbytes(self):
+        return self._metadata_cache.nbytes
 
     def reset_cache(self):
-        self._metadata_cache = {}
-        self._cache_hits = 0
-        self._cache_misses = 0
+        self._metadata_cache.clear()
+        self._prefetched = set()
+        self._prefetch_hits = 0
+
+    def close(self):
+        for future in self._prefetches:
+            future.cancel()
+        self.wait_prefetch()  # the running ones, before the file is closed
 
 
 class File:
-    def __init__(self, name):
+    def __init__(self, name, pool=None, block_size=None, block_cache_size=DEFAULT_BLOCK_CACHE_SIZE,
+                 coalesce_gap=DEFAULT_COALESCE_GAP, max_request_size=DEFAULT_MAX_REQUEST_SIZE, multirange=False,
+                 use_mmap=True, head_size=DEFAULT_HEAD_SIZE, retry=None, scheduler=None, decode_executor=None,
+                 chunk_cache=None, verify_checksums=True):
         self._name = name
-        if name.startswith("http://") or name.startswith("https://"):
-            self._fh = HTTPRangeReader(name)
+        self._lock = threading.Lock()  # serializes the seek and read pairs of read_at
+        self._coalesce_gap = coalesce_gap
+        self._max_request_size = max_request_size
+        self._multirange = multirange
+        self._retry = retry if retry is not None else RetryPolicy()
+        self._sessions = weakref.WeakKeyDictionary()  # event loop -> aiohttp session of the async reads
+        self._pool = None
+        if is_remote(name):
+            self._pool = pool if pool is not None else default_pool()
+            self._fh = HTTPRangeReader(name, pool=self._pool, block_size=block_size,
+                                       block_cache_size=block_cache_size, multirange=multirange,
+                                       head_size=head_size, retry=self._retry)
         else:
-            self._fh = open(name, "rb", buffering=0)
-
-        self._read_strategy = SimpleFileReadStrategy(self._fh)
+            self._fh = open(name, "rb")
+
+        # runs the chunk reads of all the datasets, and decodes local chunks, shut down with the file unless given
+        self._owns_scheduler = scheduler is None
+        self._scheduler = scheduler if scheduler is not None else \
+            IOScheduler(self._pool.maxsize if self._pool is not None else os.cpu_count() or DEFAULT_MAX_IN_FLIGHT)
+        # decodes local chunks instead of the scheduler if given, e.g. a ProcessPoolExecutor
+        self._decode_executor = decode_executor
+        self._raw_fd = None
+        # decoded chunks of all the datasets, an LRUCache, or its capacity in bytes, possibly shared with other files
+        if isinstance(chunk_cache, int):
+            chunk_cache = LRUCache(chunk_cache, sizeof=nbytes)
+        self._chunk_cache = chunk_cache
+        # Fletcher32 checksums of chunks are only stripped if False, to save CPU on trusted storage
+        self._verify_checksums = verify_checksums
+
+        self._read_strategy = None
+        if use_mmap and mmap is not None and not is_remote(name):
+            try:
+                self._read_strategy = MmapFileReadStrategy(self._fh)
+            except (OSError, ValueError):  # empty file or file system without memory maps
+                logging.debug(f"Cannot memory map {name}, using buffered reads.")
+        if self._read_strategy is None:
+            self._read_strategy = SimpleFileReadStrategy(self._fh)
         self._root_group = None
         self._global_heap = GlobalHeap(self)
 
@@ -334,7 +536,50 @@ class File:
         yield from self.root_group
 
     def close(self):
+        self._read_strategy.close()
         self._fh.close()
+        self._close_raw()
+
+    def _close_raw(self):
+        if self._raw_fd is not None:
+            os.close(self._raw_fd)
+            self._raw_fd = None
+        if self._owns_scheduler:
+            self._scheduler.shutdown(wait=False)
+
+    def raw_fileno(self):
+        """Descriptor of the local file holding the raw data, opened once and shared by the chunk readers, which
+        only use positional reads on it."""
+        with self._lock:
+            if self._raw_fd is None:
+                self._raw_fd = os.open(self.raw_name, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        return self._raw_fd
+
+    @classmethod
+    async def open_async(cls, name, **kwargs):
+        """Opens the file without blocking the running event loop, the superblock is read in a worker thread."""
+        return await asyncio.to_thread(cls, name, **kwargs)
+
+    def async_session(self):
+        """aiohttp session shared by the async reads of this file in the running event loop."""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = client_session(self._pool if self._pool is not None else default_pool())
+            self._sessions[loop] = session
+        return session
+
+    async def aclose(self):
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
 
     @property
     def name(self):
@@ -343,13 +588,15 @@ class File:
     @property
     def root_group(self):
         if self._root_group is None:
-            if self._sb.version < 2:
-                ste = SymbolTableEntry(self, self._sb.entrypoint + self._sb.size)
-                self._root_group = Group(self, ste.object_header_address)
-            elif self._sb.version >= 2 & self._sb.version < 4:
-                self._root_group = Group(self, self._sb.entrypoint)
+            self._root_group = Group(self, self._root_object_header_address())
         return self._root_group
 
+    def _root_object_header_address(self):
+        if self._sb.version < 2:
+            ste = SymbolTableEntry(self, self._sb.entrypoint + self._sb.size)
+            return ste.object_header_address
+        return self._sb.entrypoint
+
     @property
     def attrs(self):
         return self.root_group.attrs
@@ -378,6 +625,10 @@ class File:
     def group_internal_node_k(self):
         return self._sb.group_internal_node_k
 
+    @property
+    def indexed_storage_internal_node_k(self):
+        return self._sb.indexed_storage_internal_node_k
+
     @property
     def meta_name(self):
         return self.name
@@ -386,6 +637,50 @@ class File:
     def raw_name(self):
         return self.name
 
+    @property
+    def pool(self):
+        return self._pool
+
+    @property
+    def validator(self):
+        """Changes whenever the file changes, used to invalidate persistent caches."""
+        if is_remote(self.name):
+            return self._fh.validator
+        st = os.fstat(self._fh.fileno())
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+    @property
+    def coalesce_gap(self):
+        return self._coalesce_gap
+
+    @property
+    def max_request_size(self):
+        return self._max_request_size
+
+    @property
+    def multirange(self):
+        return self._multirange
+
+    @property
+    def retry(self):
+        return self._retry
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def decode_executor(self):
+        return self._decode_executor
+
+    @property
+    def chunk_cache(self):
+        return self._chunk_cache
+
+    @property
+    def verify_checksums(self):
+        return self._verify_checksums
+
     @property
     def chunk_offset(self):
         return 0
@@ -402,15 +697,21 @@ class File:
     def tell(self):
         return self._read_strategy.tell()
 
+    def read_at(self, pos, n):
+        """Reads `n` bytes at `pos`, safe to call from several threads sharing the file."""
+        with self._lock:
+            self.seek(pos)
+            return self.read(n)
+
     def _read_file_space_info(self):
         address = self._sb.superblock_extension_address
         self.seek(address)
-        object_header_version = int.from_bytes(self.read(1), "little")
+        byts = self.read(4)
 
-        if object_header_version == 1:
-            oh = ObjectHeaderV1(self, address)
-        elif object_header_version == 2:
+        if byts == b"OHDR":
             oh = ObjectHeaderV2(self, address)
+        elif byts[0] == 1:
+            oh = ObjectHeaderV1(self, address)
         else:
             raise ValueError("Unknown object header version.")
 
@@ -444,22 +745,49 @@ class File:
 
 
 class PagedFile(File):
-    """This class overrides access methods in order to take advantage of page buffering."""
+    """This class overrides access methods in order to take advantage of page buffering. The page cache holds at most
+    `page_cache_size` bytes (unbounded if None), the pages of the superblock and the root group are never evicted
+    if `pin_root` is set. Pages can also be kept in a `disk_cache` (a DiskPageCache or a directory) shared with
+    other processes. The first `prefetch_pages` pages are read in the background when opening the file, metadata is
+    usually at the beginning of page aggregated files."""
 
-    def __init__(self, name):
-        super().__init__(name)
+    def __init__(self, name, page_cache_size=None, pin_root=True, disk_cache=None, prefetch_pages=0, **kwargs):
+        super().__init__(name, **kwargs)
 
         if self._sb.superblock_extension_address != self.undefined_address:
             self._file_space_info = self._read_file_space_info()
         else:
             self._file_space_info = None
 
+        if isinstance(disk_cache, str):
+            disk_cache = DiskPageCache(disk_cache)
+        self._disk_cache = disk_cache
+
+        self._read_strategy.close()
         self._read_strategy = PageFileReadStrategy(
             self._fh,
             self.page_size,
-            self._read_strategy.tell())
+            self._read_strategy.tell(),
+            cache_size=page_cache_size,
+            disk_cache=disk_cache,
+            namespace=DiskPageCache.namespace(name, self.validator, self.page_size) if disk_cache is not None else None)
         self._simple_read_strategy = SimpleFileReadStrategy(self._fh)
 
+        if is_remote(name) and self._fh.head:  # the pages already read when opening the file
+            self._read_strategy.seed(0, self._fh.head, partial=len(self._fh.head) == self._fh.length)
+
+        if prefetch_pages:
+            end = self._sb.end_of_file_address
+            if self._file_space_info is not None and \
+                    self._file_space_info.end_of_allocated_space != self.undefined_address:
+                end = min(end, self._file_space_info.end_of_allocated_space)
+            npages = min(prefetch_pages, -(-end // self.page_size))
+            self._read_strategy.prefetch(0, npages, self._scheduler, self.max_request_size)
+
+        if pin_root:
+            self._read_strategy.pin(self._sb.offset)
+            self._read_strategy.pin(self._root_object_header_address())
+
     def seek(self, pos):
         self._read_strategy.seek(pos)
 
@@ -484,12 +812,28 @@ class PagedFile(File):
     def cache_misses(self):
         return self._read_strategy.cache_misses
 
+    @property
+    def cache_evictions(self):
+        return self._read_strategy.cache_evictions
+
+    @property
+    def prefetch_hits(self):
+        return self._read_strategy.prefetch_hits
+
+    def wait_prefetch(self, timeout=None):
+        """Waits for the pages read in the background when opening the file, returns True if they are all read."""
+        return self._read_strategy.wait_prefetch(timeout)
+
+    @property
+    def disk_cache(self):
+        return self._disk_cache
+
     def reset_cache(self):
         self._read_strategy.reset_cache()
 
 
 class SplitFile(File):
-    def __init__(self, name, meta_ext=None, raw_ext=None):
+    def __init__(self, name, meta_ext=None, raw_ext=None, **kwargs):
         self._name = name
         self._meta_ext = meta_ext
         self._raw_ext = raw_ext
@@ -498,11 +842,10 @@ class SplitFile(File):
         if self._raw_ext is None:
             self._raw_ext = "-r.h5"
 
-        super().__init__(f"{name}{self._meta_ext}")
+        super().__init__(f"{name}{self._meta_ext}", **kwargs)
 
-        if name.startswith("http://") or name.startswith("https://"):
-            with urllib.request.urlopen(self.meta_name) as response:
-                self._meta = response.read()
+        if is_remote(name):
+            _, _, self._meta = self._pool.request("GET", self.meta_name)
         else:
             with open(self.meta_name, "rb") as fh:
                 self._meta = fh.read()
@@ -533,6 +876,7 @@ class SplitFile(File):
 
     def close(self):
         self._fh.close()
+        self._close_raw()
 
     # Properties related to the "split" driver
     @property
@@ -620,20 +964,16 @@ class SymbolTableMessage:
         self._heap = LocalHeap(self._f, self._heap_address)
 
     def links(self):
+        # all the names are in the data segment of the local heap, read it once
+        self._f.seek(self._heap.address_data_segment)
+        names = bytes(self._f.read(self._heap.data_segment_size))
+
         for snod_offset in self._btree.symbol_table_entries():
             snod = snod_offset["snod"]
             symbol_table_node = SymbolTableNode(self._f, snod)
             for offset, object_header_address in symbol_table_node.links():
-                self._f.seek(self._heap.address_data_segment + offset)
-
                 # the name is null terminated
-                byts = bytearray(0)
-                byt = self._f.read(1)
-                while byt != b"\x00":
-                    byts.append(int.from_bytes(byt, "little"))
-                    byt = self._f.read(1)
-
-                link_name = byts.replace(b"\x00", b"").decode("ascii")
+                link_name = names[offset:names.index(b"\x00", offset)].decode("ascii")
                 link = SimpleLink(link_name, object_header_address)
                 yield link
 
@@ -643,26 +983,24 @@ class SymbolTableNode:  # A leaf of a b-tree
         self._f = file
         self._o = offset
 
+        entry_dtype = np.dtype([("link_name_offset", f"<u{self._f.size_of_offsets}"),
+                                ("object_header_address", f"<u{self._f.size_of_offsets}"),
+                                ("cache_type", "<u4"),
+                                ("reserved", "<u4"),
+                                ("scratch_pad", "V16")])
         self._f.seek(self._o)
-        # byts = self._f.read(12)  # group leaf node k
-        self._entry_size = 2 * self._f.size_of_offsets + 8 + 16
-        byts = self._f.read(8 + 2 * self._f.group_leaf_node_k * self._entry_size)
+        byts = self._f.read(8 + 2 * self._f.group_leaf_node_k * entry_dtype.itemsize)
 
         assert byts[:4] == b"SNOD"
         assert byts[4] == 1
         # 1 empty byte
         self._number_of_symbols = int.from_bytes(byts[6:8], "little")
-        self._group_entries = byts[8:]
+        entries = np.frombuffer(byts, dtype=entry_dtype, count=self._number_of_symbols, offset=8)
+        self._link_name_offsets = entries["link_name_offset"].tolist()
+        self._object_header_addresses = entries["object_header_address"].tolist()
 
     def links(self):
-        for i in range(self._number_of_symbols):
-            frm, to = i * self._entry_size, i * self._entry_size + self._f.size_of_offsets
-            link_name_offset = int.from_bytes(self._group_entries[frm:to], "little")
-
-            frm, to = to, to + self._f.size_of_offsets
-            object_header_address = int.from_bytes(self._group_entries[frm:to], "little")
-
-            yield link_name_offset, object_header_address
+        yield from zip(self._link_name_offsets, self._object_header_addresses)
 
 
 class ObjectHeader:
@@ -704,7 +1042,7 @@ class ObjectHeaderV1(ObjectHeader):
             elif len(buffer) == offset:
                 cm = continuation_queue.pop(0)
                 self._fh.seek(cm.offset)
-                buffer += self._fh.read(cm.length)
+                buffer = bytes(buffer) + self._fh.read(cm.length)
                 global_offset = cm.offset
 
             msg = _unpack_struct_from(OrderedDict((
@@ -842,16 +1180,22 @@ class FileSpaceInfoV1:
         nbyts = (3 + self._f.size_of_lengths + 5 + 13 * self._f.size_of_offsets)
         byts = self._f.read(nbyts)
 
-        self._persisting_free_space = byts[3] != 0
+        self._persisting_free_space = byts[2] != 0
         self._free_space_section_threshold = int.from_bytes(
-            byts[4:4 + self._f.size_of_lengths], "little")
+            byts[3:3 + self._f.size_of_lengths], "little")
         self._page_size = int.from_bytes(
             byts[3 + self._f.size_of_lengths:3 + self._f.size_of_lengths + 4], "little")
+        frm = 3 + 2 * self._f.size_of_lengths + 2
+        self._end_of_allocated_space = int.from_bytes(byts[frm:frm + self._f.size_of_offsets], "little")
 
     @property
     def page_size(self):
         return self._page_size
 
+    @property
+    def end_of_allocated_space(self):
+        return self._end_of_allocated_space
+
 
 class GroupInfoMessage:
     def __init__(self, fh, offset):
@@ -892,14 +1236,23 @@ class Group:
         else:
             self._do = ObjectHeaderV1(self._f, offset)
 
+        # messages of the object header, and link info messages with their heap and b-trees, kept for the lookups
+        self._messages = None
+        self._link_infos = {}  # message offset -> LinkInfoMessage
+
+    def _msgs(self):
+        if self._messages is None:
+            self._messages = list(self._do.msgs())
+        return self._messages
+
+    def _link_info(self, offset):
+        if offset not in self._link_infos:
+            self._link_infos[offset] = LinkInfoMessage(self._f, offset)
+        return self._link_infos[offset]
+
     def __getitem__(self, item):
         if isinstance(item, str):
-            link = None
-            # links = list(self.links())
-            for l in self.links():
-                if l.name == item:
-                    link = l
-                    break
+            link = self.get_link(item)
             if link is None:
                 raise ValueError
 
@@ -949,12 +1302,29 @@ class Group:
                 d[attr.name] = attr.value
         return d
 
+    def get_link(self, name):
+        """The link called `name` or None, dense groups are looked up in their name index."""
+        for m in self._msgs():
+            if m["type"] == 6:  # link message
+                link = LinkMessage(self._f, m['offset'])
+                if link.name == name:
+                    return link
+            elif m["type"] == 2:  # link info message
+                link = self._link_info(m['offset']).get(name)
+                if link is not None:
+                    return link
+            elif m["type"] == 17:  # symbol table message type
+                for link in SymbolTableMessage(self._f, m['offset'], self).links():
+                    if link.name == name:
+                        return link
+        return None
+
     def links(self):
-        for m in self._do.msgs():
+        for m in self._msgs():
             if m["type"] == 6:  # link message
                 yield LinkMessage(self._f, m['offset'])
             elif m["type"] == 2:  # link info message
-                lim = LinkInfoMessage(self._f, m['offset'])
+                lim = self._link_info(m['offset'])
                 for x in lim.solve():
                     yield x
             elif m["type"] == 17:  # symbol table message type
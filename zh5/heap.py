@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 class LocalHeap:
     def __init__(self, file, offset):
@@ -23,6 +25,10 @@ class LocalHeap:
     def address_data_segment(self):
         return self._address_data_segment
 
+    @property
+    def data_segment_size(self):
+        return self._data_segment_size
+
 
 class GlobalHeapObject:
     def __init__(self, file):
@@ -35,7 +41,7 @@ class GlobalHeapObject:
         # 4 empty bytes
         size = int.from_bytes(byts[-self._f.size_of_lengths:], "little")
         self._object_size = math.ceil(size / 8) * 8
-        self._object_data = self._f.read(self._object_size)
+        self._object_data = bytes(self._f.read(self._object_size))
 
     @property
     def index(self):
@@ -98,52 +104,37 @@ class FractalHeapIndirectBlock:
         self._heap = heap
         self._nrows = nrows
 
-        self._f.seek(self._o)
-        byts = self._f.read(5 + self._f.size_of_offsets)
+        # the first rows point to direct blocks, the others to indirect blocks, read all the entries at once
+        address_dtype = f"<u{self._f.size_of_offsets}"
+        direct_dtype = np.dtype([("address", address_dtype)] if not self._heap.filtered else
+                                [("address", address_dtype),
+                                 ("filtered_size", f"<u{self._f.size_of_lengths}"),
+                                 ("filter_mask", "<u4")])
+        ndirect = min(nrows, self._heap.max_dblock_rows) * self._heap.table_width
+        nindirect = max(nrows - self._heap.max_dblock_rows, 0) * self._heap.table_width
+        header_size = 5 + self._f.size_of_offsets + self._heap.maximum_heap_size
+        byts = self._f.read_at(self._o, header_size + ndirect * direct_dtype.itemsize +
+                               nindirect * self._f.size_of_offsets)
         assert byts[:4] == b"FHIB"
         self._version = byts[4]
         self._heap_header_address = int.from_bytes(byts[5:5 + self._f.size_of_offsets], "little")  # for integrity
-        self._block_offset = int.from_bytes(self._f.read(self._heap.maximum_heap_size), "little")
+        self._block_offset = int.from_bytes(byts[5 + self._f.size_of_offsets:header_size], "little")
 
-        self._offset_data = self._f.tell()
+        self._direct = np.frombuffer(byts, dtype=direct_dtype, count=ndirect, offset=header_size)["address"].tolist()
+        self._indirect = np.frombuffer(byts, dtype=address_dtype, count=nindirect,
+                                       offset=header_size + ndirect * direct_dtype.itemsize).tolist()
 
-    def read(self):
-        # py5 _indirect_info (is this only for root indirect block?)
-        nobjects = self._nrows * self._heap.table_width
-        ndirect_max = self._heap.max_dblock_rows * self._heap.table_width
-        if self._nrows <= ndirect_max:
-            ndirect = nobjects
-            nindirect = 0
+    @property
+    def nrows(self):
+        return self._nrows
+
+    def child(self, row, column):
+        """Address of the block at `row` and `column` of the doubling table, None if not allocated."""
+        if row < self._heap.max_dblock_rows:
+            address = self._direct[row * self._heap.table_width + column]
         else:
-            ndirect = ndirect_max
-            nindirect = nobjects - ndirect_max
-
-        self._f.seek(self._offset_data)
-        direct, indirect = [], []
-        for i in range(ndirect):
-            address = int.from_bytes(self._f.read(8), "little")
-            if address == self._f.undefined_address:
-                break
-            row = i // self._heap.table_width
-            block_size = 2 ** max(row - 1, 0) * self._heap.starting_block_size
-            direct.append((address, block_size))
-        for i in range(nindirect):
-            address = int.from_bytes(self._f.read(8), "little")
-            if address == self._f.undefined_address:
-                break
-            row = i // self._heap.table_width
-            block_size = 2 ** max(row - 1, 0) * self._heap.starting_block_size
-            indirect.append((address, block_size))
-
-        for address, block_size in direct:
-            block = FractalHeapDirectBlock(self._f, address, self._heap, block_size)
-            obj = block
-            yield obj
-
-        for address, nrows in indirect:
-            block = FractalHeapIndirectBlock(self._f, address, self._heap, nrows)
-            for obj in block.read():
-                yield obj
+            address = self._indirect[(row - self._heap.max_dblock_rows) * self._heap.table_width + column]
+        return address if address != self._f.undefined_address else None
 
 
 class FractalHeapDirectBlock:
@@ -254,16 +245,7 @@ class FractalHeap:
         value = value.bit_length()
         self._managed_object_length_size = value // 8 + min(value % 8, 1)
 
-        self._managed = []
-        if self._address_root_block != self._f.undefined_address:
-            nrows = self._current_n_of_rows_in_root_indirect_block
-            if nrows > 0:
-                block = FractalHeapIndirectBlock(self._f, self._address_root_block, self, nrows)
-                for b in block.read():
-                    self._managed.append(b)
-            else:
-                block = FractalHeapDirectBlock(self._f, self._address_root_block, self, self._starting_block_size)
-                self._managed.append(block)
+        self._indirect_blocks = {}  # address -> FractalHeapIndirectBlock, every indirect block read
 
     @property
     def nbits(self):
@@ -273,6 +255,10 @@ class FractalHeap:
     def maximum_heap_size(self):
         return self._maximum_heap_size
 
+    @property
+    def filtered(self):
+        return self._io_filters_encoded_length > 0
+
     @property
     def table_width(self):
         return self._table_width
@@ -291,6 +277,35 @@ class FractalHeap:
 
         return log2_maximum_direct_block_size - log2_starting_block_size + 2
 
+    def _indirect_block(self, address, nrows):
+        if address not in self._indirect_blocks:
+            self._indirect_blocks[address] = FractalHeapIndirectBlock(self._f, address, self, nrows)
+        return self._indirect_blocks[address]
+
+    def _managed_address(self, offset):
+        """File address of the managed object at `offset` in the heap, reading only the indirect blocks of the
+        doubling table on the way to its direct block."""
+        nrows = self._current_n_of_rows_in_root_indirect_block
+        address = self._address_root_block
+        if nrows == 0:  # the root is a direct block
+            return address + offset
+
+        width, start = self._table_width, self._starting_block_size
+        while True:
+            block = self._indirect_block(address, nrows)
+            # rows 0 and 1 have blocks of the starting size, then their size doubles with each row
+            row = (offset // (width * start)).bit_length()
+            row_offset = 0 if row == 0 else width * start * 2 ** (row - 1)
+            block_size = start * 2 ** max(row - 1, 0)
+            column = (offset - row_offset) // block_size
+            offset -= row_offset + column * block_size  # offset in the child block
+            address = block.child(row, column)
+            if address is None:
+                raise ValueError("Heap id of an unallocated fractal heap block.")
+            if row < self.max_dblock_rows:
+                return address + offset  # objects offsets count the header of their direct block
+            nrows = (block_size // (width * start)).bit_length()
+
     def get_data(self, heap_id):
         firstbyte = heap_id[0]
         reserved = firstbyte & 15  # bit 0-3
@@ -306,22 +321,7 @@ class FractalHeap:
             nbytes = self._managed_object_length_size
             size = int.from_bytes(heap_id[data_offset:data_offset + nbytes], "little")
 
-            # calculate direct block offset
-            # ToDo this involves having all the fractal heap read into memory, fix (need to implement proper reading
-            # of the doubling table)
-            acc = 0
-            block_id = 0
-            for i, block in enumerate(self._managed):
-                block_length = block.size
-                acc += block_length
-                if offset < acc:
-                    block_id = i
-                    acc -= block_length
-                    break
-
-            # return self._managed[offset:offset + size] # Do not return data, return the offset in the file
-            a = self._managed[block_id].offset + (offset - acc)
-            return a
+            return self._managed_address(offset)  # Do not return data, return the offset in the file
         elif idtype == 1:  # tiny
             raise NotImplementedError
         elif idtype == 2:  # huge
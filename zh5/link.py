@@ -1,3 +1,5 @@
+from numcodecs.jenkins import jenkins_lookup3
+
 from zh5.heap import FractalHeap
 from zh5.tree import BtreeV2
 
@@ -44,13 +46,13 @@ class LinkInfoMessage(Link):
                 byts[self._f.size_of_offsets:2 * self._f.size_of_offsets], "little")
         elif self._flags == 1:
             byts = self._f.read(s + 8)
-            self._maximum_creation_index = byts[:8]
+            self._maximum_creation_index = int.from_bytes(byts[:8], "little")
             self._fractal_heap_address = int.from_bytes(
-                byts[8:self._f.size_of_offsets], "little")
+                byts[8:8 + self._f.size_of_offsets], "little")
             self._address_of_v2_btree_for_name_index = int.from_bytes(
                 byts[8 + self._f.size_of_offsets:8 + 2 * self._f.size_of_offsets], "little")
         elif self._flags == 2:
-            byts = self._f.read(s)
+            byts = self._f.read(s + self._f.size_of_offsets)
             self._fractal_heap_address = int.from_bytes(
                 byts[:self._f.size_of_offsets], "little")
             self._address_of_v2_btree_for_name_index = int.from_bytes(
@@ -68,16 +70,46 @@ class LinkInfoMessage(Link):
         else:
             raise ValueError("What?")
 
-        self._heap = FractalHeap(self._f, self._fractal_heap_address)
-        self._btree_name = BtreeV2(self._f, self._address_of_v2_btree_for_name_index)
-        self._btree_order = BtreeV2(self._f, self._address_of_v2_btree_for_creation_order_index)
+        self._heap = None
+        self._btree_name = None
+        self._btree_order = None
+        if self._fractal_heap_address != self._f.undefined_address:  # else links are stored as link messages
+            self._heap = FractalHeap(self._f, self._fractal_heap_address)
+
+    @property
+    def name_index(self):
+        if self._btree_name is None and self._heap is not None:
+            self._btree_name = BtreeV2(self._f, self._address_of_v2_btree_for_name_index)
+        return self._btree_name
+
+    @property
+    def creation_order_index(self):
+        if self._btree_order is None and self._heap is not None and self._flags & 2:  # creation order indexed
+            self._btree_order = BtreeV2(self._f, self._address_of_v2_btree_for_creation_order_index)
+        return self._btree_order
 
     def solve(self):
-        for record in self._btree_order.records():
+        if self._heap is None:
+            return
+
+        btree = self.creation_order_index if self.creation_order_index is not None else self.name_index
+        for record in btree.records():
             offset = self._heap.get_data(record["heap_id"])
             l = LinkMessage(self._f, offset)
             yield l
 
+    def get(self, name):
+        """The link called `name`, found descending the name index by the hash of the name, None if the group does
+        not have it or its links are stored as link messages."""
+        if self._heap is None:
+            return None
+
+        for record in self.name_index.find(jenkins_lookup3(name.encode("utf-8"))):
+            link = LinkMessage(self._f, self._heap.get_data(record["heap_id"]))
+            if link.name == name:
+                return link
+        return None
+
 
 class LinkMessage(Link):
     def __init__(self, fh, offset):
@@ -98,12 +130,12 @@ class LinkMessage(Link):
             self._creation_order = int.from_bytes(fh.read(8), "little")
 
         if (self._flags >> 4) & 0b1:
-            self._link_name_character_set = fh.read(1).decode("ascii")
+            self._link_name_character_set = "utf-8" if fh.read(1)[0] == 1 else "ascii"
         else:
             self._link_name_character_set = "ascii"
 
         self._length_of_link_name = int.from_bytes(fh.read(2 ** (self._flags & 0b11)), "little")
-        self._link_name = fh.read(self._length_of_link_name)
+        self._link_name = bytes(fh.read(self._length_of_link_name))
 
         # ToDo: hard link support only at the moment
         self._link_information = int.from_bytes(fh.read(self._fh.size_of_offsets), "little")  # object header address
@@ -1,28 +1,495 @@
+import collections
+import concurrent.futures
+import http.client
 import logging
-import urllib
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+from zh5.cache import LRUCache
+
+# connection errors that mean a keep-alive connection was closed by the server while idle
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# transient server errors worth retrying, object stores answer 503 or 429 when throttling
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_BLOCK_CACHE_SIZE = 32 * 2 ** 20
+# seconds to connect or wait for data before a request fails, and is retried
+DEFAULT_TIMEOUT = 60
+# the first bytes of a file read when opening it, usually enough for the superblock and the root group
+DEFAULT_HEAD_SIZE = 64 * 2 ** 10
+
+
+def is_remote(name):
+    return name.startswith("http://") or name.startswith("https://")
+
+
+def parse_content_range(value):
+    """Parses a 'bytes start-end/total' Content-Range header into (start, end, total), total is None if unknown."""
+    unit, _, spec = value.strip().partition(" ")
+    if unit != "bytes":
+        raise ValueError(f"Unknown Content-Range unit in '{value}'.")
+    interval, _, total = spec.partition("/")
+    start, _, end = interval.partition("-")
+    return int(start), int(end), None if total == "*" else int(total)
+
+
+def parse_multipart_byteranges(data, content_type):
+    """Splits a multipart/byteranges body into a list of (start, bytes) parts."""
+    boundary = None
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            boundary = value.strip('"').encode("ascii")
+    if boundary is None:
+        raise ValueError("No boundary in multipart/byteranges Content-Type.")
+
+    parts = []
+    delimiter = b"--" + boundary
+    pos = data.index(delimiter)
+    while data[pos + len(delimiter):pos + len(delimiter) + 2] != b"--":
+        headers_end = data.index(b"\r\n\r\n", pos)
+        start, end = None, None
+        for line in data[pos + len(delimiter):headers_end].split(b"\r\n"):
+            key, _, value = line.decode("latin-1").partition(":")
+            if key.strip().lower() == "content-range":
+                start, end, _ = parse_content_range(value)
+        if start is None:
+            raise ValueError("Missing Content-Range in multipart/byteranges part.")
+
+        # the length is known from the Content-Range, do not look for the boundary inside binary data
+        body_start = headers_end + 4
+        parts.append((start, data[body_start:body_start + end - start + 1]))
+        pos = data.index(delimiter, body_start + end - start + 1)
+
+    return parts
+
+
+def split_multirange_response(status, headers, data, ranges):
+    """Returns the buffers of each (offset, size) in `ranges` from the response to a multi-range request, or None if
+    the response does not contain all of them (the server ignored or only partially honoured the request)."""
+    content_type = headers.get("Content-Type", "")
+    if status == 206 and content_type.startswith("multipart/byteranges"):
+        parts = parse_multipart_byteranges(data, content_type)
+    elif status == 206 and headers.get("Content-Range"):
+        start, _, _ = parse_content_range(headers["Content-Range"])
+        parts = [(start, data)]
+    else:
+        return None
+
+    buffers = []
+    for offset, size in ranges:
+        for start, part in parts:  # servers may merge overlapping or adjacent ranges into one part
+            if start <= offset and offset + size <= start + len(part):
+                buffers.append(part[offset - start:offset - start + size])
+                break
+        else:
+            return None
+
+    return buffers
+
+
+class RetryPolicy:
+    """Retries failed requests up to `retries` times, sleeping an exponential backoff of `backoff * 2 ** attempt`
+    seconds (at most `max_backoff`) with full jitter. If `hedge` is set, a duplicate of a range request is sent once it
+    takes longer than the `hedge_quantile` of the latencies seen so far, and the first response wins."""
+
+    def __init__(self, retries=3, backoff=0.1, max_backoff=10.0, jitter=True, hedge=False, hedge_quantile=0.95,
+                 hedge_min_samples=20):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+    def delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    @staticmethod
+    def retryable(error):
+        if isinstance(error, urllib.error.HTTPError):  # before OSError, HTTPError is one
+            return error.code in RETRY_STATUSES
+        return isinstance(error, (OSError, http.client.HTTPException))  # timeouts, resets, truncated responses
+
+    def hedge_delay(self, latencies):
+        """Seconds to wait before hedging given the recent `latencies`, None if hedging is off or there are too few."""
+        if not self.hedge or len(latencies) < self.hedge_min_samples:
+            return None
+        latencies = sorted(latencies)
+        return latencies[min(len(latencies) - 1, int(self.hedge_quantile * len(latencies)))]
+
+
+class HTTPConnectionPool:
+    """Keep-alive HTTP(S) connections, at most `maxsize` connections per host in use by requests, and
+    `hedge_maxsize` more (`maxsize` if None) by hedged requests, which never wait behind the slow requests they
+    duplicate. Requests fail after `timeout` seconds without progress, None waits forever."""
+
+    def __init__(self, maxsize=20, timeout=DEFAULT_TIMEOUT, max_redirects=5, hedge_maxsize=None):
+        self._maxsize = maxsize
+        self._hedge_maxsize = hedge_maxsize if hedge_maxsize is not None else maxsize
+        self._timeout = timeout
+        self._max_redirects = max_redirects
+
+        self._cond = threading.Condition()
+        self._idle = {}  # (scheme, host, port) -> list of idle connections
+        self._nconnections = {}  # (scheme, host, port) -> number of open connections
+        self._busy = {}  # (scheme, host, port) -> number of connections in use by requests that are not hedges
+        self._connections_created = 0
+        self._requests = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @property
+    def hedge_maxsize(self):
+        return self._hedge_maxsize
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def connections_created(self):
+        return self._connections_created
+
+    @property
+    def requests(self):
+        return self._requests
+
+    def _acquire(self, key, hedge=False):
+        with self._cond:
+            while True:
+                if hedge or self._busy.get(key, 0) < self._maxsize:
+                    if not hedge:
+                        self._busy[key] = self._busy.get(key, 0) + 1
+                    idle = self._idle.setdefault(key, [])
+                    if idle:
+                        return idle.pop(), True
+                    if self._nconnections.get(key, 0) < self._maxsize + self._hedge_maxsize:
+                        self._nconnections[key] = self._nconnections.get(key, 0) + 1
+                        self._connections_created += 1
+                        break
+                    if not hedge:
+                        self._busy[key] -= 1
+                self._cond.wait()
+
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self._timeout), False
+        return http.client.HTTPConnection(host, port, timeout=self._timeout), False
+
+    def _release(self, key, conn, reuse, hedge=False):
+        with self._cond:
+            if not hedge:
+                self._busy[key] -= 1
+            if reuse:
+                self._idle[key].append(conn)
+            else:
+                conn.close()
+                self._nconnections[key] -= 1
+            self._cond.notify_all()  # requests and hedges wait for different slots
+
+    def _request_once(self, method, url, headers, partial=False, hedge=False):
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+
+        while True:
+            conn, reused = self._acquire(key, hedge)
+            try:
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+                # a 200 to a range request is the whole object, drop it with the connection instead of reading it
+                data = None if partial and response.status == 200 else response.read()
+            except STALE_CONNECTION_ERRORS:
+                self._release(key, conn, reuse=False, hedge=hedge)
+                if reused:
+                    continue  # the server closed an idle connection, try again on a fresh one
+                raise
+            except BaseException:
+                self._release(key, conn, reuse=False, hedge=hedge)
+                raise
+
+            self._release(key, conn, reuse=data is not None and not response.will_close, hedge=hedge)
+            with self._cond:
+                self._requests += 1
+            return response, data
+
+    def request(self, method, url, headers=None, partial=False, hedge=False):
+        """Returns (status, headers, body) following redirects, raises HTTPError for error statuses. If `partial`,
+        the body of a 200 response is not downloaded and is None. A `hedge` uses the connections kept for hedges."""
+        headers = headers or {}
+        for i in range(self._max_redirects + 1):
+            response, data = self._request_once(method, url, headers, partial, hedge)
+            if response.status in REDIRECT_STATUSES and response.headers.get("Location"):
+                url = urllib.parse.urljoin(url, response.headers["Location"])
+                continue
+            if response.status >= 400:
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            return response.status, response.headers, data
+
+        raise urllib.error.HTTPError(url, response.status, "Too many redirects.", response.headers, None)
+
+    def close(self):
+        with self._cond:
+            for key, idle in self._idle.items():
+                for conn in idle:
+                    conn.close()
+                self._nconnections[key] -= len(idle)
+            self._idle = {}
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    """Process-wide pool used when no pool is given."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPConnectionPool()
+    return _default_pool
 
 
 class HTTPRangeReader:
-    def __init__(self, url):
+    """File-like reader of a remote object. If `head_size` is given, the first `head_size` bytes are read when it is
+    created, together with the length and validator of the object, and later reads within them do no request.
+    Failed requests are retried following `retry`, a RetryPolicy."""
+
+    def __init__(self, url, pool=None, block_size=None, block_cache_size=DEFAULT_BLOCK_CACHE_SIZE, multirange=False,
+                 head_size=0, retry=None):
         self.url = url
+        self.pool = pool if pool is not None else default_pool()
+        self._retry = retry if retry is not None else RetryPolicy()
+        self._latencies = collections.deque(maxlen=1000)  # seconds, of the last successful range requests
+        self._hedge_executor = None
+        self._running = 0  # requests submitted to the hedge executor and not finished
+        self._lock = threading.Lock()
+        self._retries = 0
+        self._hedges = 0
         self.pos = 0
-        self.length = self._get_content_length()
+        self._length = None
+        self._validator = None
+        # try several ranges per request, disabled on the first response that is not multipart/byteranges
+        self._multirange = multirange
+
+        # optional read-ahead cache of `block_size` aligned blocks, keyed by block id
+        self._block_size = block_size
+        self._blocks = LRUCache(block_cache_size) if block_size else None
+
+        self._head = b""
+        if head_size:
+            self._fetch_head(head_size)
+
+    @property
+    def length(self):
+        if self._length is None:
+            self._length = self._get_content_length()
+        return self._length
+
+    @property
+    def multirange(self):
+        return self._multirange
+
+    @property
+    def block_size(self):
+        return self._block_size
+
+    @property
+    def block_cache(self):
+        return self._blocks
+
+    @property
+    def head(self):
+        return self._head
+
+    @property
+    def validator(self):
+        """Identifies this version of the remote object, from its ETag or Last-Modified headers and its length."""
+        if self._validator is None:
+            self._length = self._get_content_length()
+        return self._validator
+
+    @property
+    def retry(self):
+        return self._retry
+
+    @property
+    def retries(self):
+        return self._retries
+
+    @property
+    def hedges(self):
+        return self._hedges
+
+    def _request(self, method, headers=None, partial=False, hedge=False):
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                result = self.pool.request(method, self.url, headers, partial, hedge)
+            except Exception as e:
+                if attempt >= self._retry.retries or not self._retry.retryable(e):
+                    raise
+                delay = self._retry.delay(attempt)
+                logging.debug(f"Retrying {method} {self.url} {headers} in {delay:.3f}s after: {e!r}.")
+                with self._lock:
+                    self._retries += 1
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if method == "GET":
+                self._latencies.append(time.monotonic() - start)
+            return result
+
+    def _submit(self, headers, partial, hedge=False):
+        """Submits a GET to the hedge executor, its worker reserved in `self._running` by the caller."""
+        def done(future):
+            with self._lock:
+                self._running -= 1
+
+        future = self._hedge_executor.submit(self._request, "GET", headers, partial, hedge)
+        future.add_done_callback(done)
+        return future
+
+    def _get(self, headers, partial=False):
+        """A GET with retries, hedged by a second identical request if the first one is slower than usual."""
+        delay = self._retry.hedge_delay(self._latencies)
+        if delay is None:
+            return self._request("GET", headers, partial)
+
+        # room for a hedge next to each primary request, hedges never wait behind primaries for a worker
+        workers = 2 * self.pool.maxsize
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            self._running += 1
+        futures = [self._submit(headers, partial)]
+        done, _ = concurrent.futures.wait(futures, timeout=delay)
+        with self._lock:
+            hedge = not done and self._running < workers  # skipped when every worker is busy
+            if hedge:
+                self._running += 1
+                self._hedges += 1
+        if hedge:
+            logging.debug(f"Hedging {self.url} {headers} after {delay:.3f}s.")
+            futures.append(self._submit(headers, partial, hedge=True))
+
+        # the first successful response wins, the slower request finishes in the background
+        pending = futures
+        while True:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            if not pending:
+                return done.pop().result()  # every request failed, raise
+
+    def _set_validator(self, headers, length):
+        self._validator = f"{headers.get('ETag', '')}-{headers.get('Last-Modified', '')}-{length}"
 
     def _get_content_length(self):
-        req = urllib.request.Request(self.url, method='HEAD')
-        with urllib.request.urlopen(req) as response:
-            return int(response.headers['Content-Length'])
+        status, headers, _ = self._request("HEAD")
+        length = int(headers['Content-Length'])
+        self._set_validator(headers, length)
+        return length
+
+    def _fetch_head(self, size):
+        status, headers, data = self._request("GET", {'Range': f'bytes=0-{size - 1}'})
+        if status == 206:
+            _, _, self._length = parse_content_range(headers["Content-Range"])
+        else:  # the server ignored the range header and sent the whole file
+            self._length = len(data)
+        if self._length is not None:
+            self._set_validator(headers, self._length)
+        self._head = data[:size]
+
+        if self._blocks is not None:
+            bs = self._block_size
+            for blockid in range(len(self._head) // bs):
+                self._blocks.put(blockid, self._head[bs * blockid:bs * (blockid + 1)])
+
+    def _fetch(self, offset, size):
+        headers = {'Range': f'bytes={offset}-{offset + size - 1}'}
+        logging.debug(f"HTTP range header request: {headers}.")
+        status, _, data = self._get(headers)
+        if status == 200:  # the server ignored the range header and sent the whole file
+            self._length = len(data)
+            data = data[offset:offset + size]
+        return data
+
+    def _read_blocks(self, offset, size):
+        bs = self._block_size
+        first, last = offset // bs, (offset + size - 1) // bs
+
+        blocks, missing = {}, []
+        for blockid in range(first, last + 1):
+            block = self._blocks.get(blockid)
+            if block is None:
+                missing.append(blockid)
+            else:
+                blocks[blockid] = block
+
+        # one request for each run of consecutive missing blocks
+        runs = []
+        for blockid in missing:
+            if runs and runs[-1][-1] == blockid - 1:
+                runs[-1].append(blockid)
+            else:
+                runs.append([blockid])
+        for run in runs:
+            byts = self._fetch(run[0] * bs, len(run) * bs)
+            for i, blockid in enumerate(run):
+                blocks[blockid] = byts[i * bs:(i + 1) * bs]
+                self._blocks.put(blockid, blocks[blockid])
+
+        frm = offset - first * bs
+        if first == last:
+            return blocks[first][frm:frm + size]
+        return b"".join(blocks[blockid] for blockid in range(first, last + 1))[frm:frm + size]
+
+    def read_range(self, offset, size):
+        """Reads `size` bytes at `offset` without moving the position, safe to call from several threads."""
+        if size <= 0:
+            return b""
+
+        if offset + size <= len(self._head) or (self._head and len(self._head) == self._length):
+            return self._head[offset:offset + size]  # a short read past the end if the head is the whole file
+        if self._blocks is None or (self._blocks.capacity is not None and size > self._blocks.capacity):
+            return self._fetch(offset, size)
+        return self._read_blocks(offset, size)
+
+    def read_ranges(self, ranges):
+        """Reads a list of (offset, size) ranges, with a single multi-range request if the server supports it."""
+        if not self._multirange or len(ranges) < 2:
+            return [self.read_range(offset, size) for offset, size in ranges]
+
+        spec = ",".join(f"{offset}-{offset + size - 1}" for offset, size in ranges)
+        logging.debug(f"HTTP multi-range request for {len(ranges)} ranges.")
+        # a server ignoring the ranges answers 200 with the whole file, which is not downloaded
+        status, headers, data = self._get({"Range": f"bytes={spec}"}, partial=True)
+        buffers = split_multirange_response(status, headers, data, ranges)
+        if buffers is not None:
+            return buffers
+
+        logging.debug(f"{self.url} does not support multi-range requests, using single ranges.")
+        self._multirange = False
+        return [self.read_range(offset, size) for offset, size in ranges]
 
     def read(self, size=-1):
         if size == -1:
             size = self.length - self.pos
-        start = self.pos
-        end = start + size - 1
-        headers = {'Range': f'bytes={start}-{end}'}
-        logging.debug(f"HTTP range header request: {headers}.")
-        req = urllib.request.Request(self.url, headers=headers)
-        with urllib.request.urlopen(req) as response:
-            data = response.read()
+        data = self.read_range(self.pos, size)
         self.pos += len(data)
         return data
 
@@ -35,10 +502,14 @@ class HTTPRangeReader:
             self.pos = self.length + offset
         else:
             raise ValueError("Invalid value for 'whence'.")
-        self.pos = max(0, min(self.pos, self.length))
+        self.pos = max(0, self.pos)
+        if self._length is not None:
+            self.pos = min(self.pos, self._length)
 
     def tell(self):
         return self.pos
 
     def close(self):
-        pass
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
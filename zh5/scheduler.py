@@ -0,0 +1,93 @@
+import concurrent.futures
+import heapq
+import itertools
+import threading
+
+DEFAULT_MAX_IN_FLIGHT = 20
+# lower values run first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 10
+
+
+class IOScheduler:
+    """Long-lived worker threads running the I/O tasks of one or several files, at most `max_in_flight` at a time.
+    Queued tasks run by priority, and the largest first among tasks of the same priority, which shortens the time to
+    finish a batch of reads of different sizes."""
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self._max_in_flight = max_in_flight
+
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, -size, sequence number, future, fn, args)
+        self._counter = itertools.count()
+        self._workers = []
+        self._idle = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._shutdown = False
+
+    @property
+    def max_in_flight(self):
+        return self._max_in_flight
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queued(self):
+        return len(self._queue)
+
+    @property
+    def completed(self):
+        return self._completed
+
+    def submit(self, fn, *args, priority=PRIORITY_INTERACTIVE, size=0):
+        """Schedules fn(*args), `size` is the number of bytes it reads. Returns a concurrent.futures.Future."""
+        future = concurrent.futures.Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a scheduler after shutdown.")
+            heapq.heappush(self._queue, (priority, -size, next(self._counter), future, fn, args))
+            # idle workers only count down once awake, a burst of tasks needs more workers than were idle
+            if len(self._queue) > self._idle and len(self._workers) < self._max_in_flight:
+                worker = threading.Thread(target=self._work, daemon=True, name=f"zh5-io-{len(self._workers)}")
+                self._workers.append(worker)
+                worker.start()
+            else:
+                self._cond.notify()
+        return future
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._idle += 1
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                self._idle -= 1
+                if not self._queue:
+                    return  # shut down
+                _, _, _, future, fn, args = heapq.heappop(self._queue)
+                self._in_flight += 1
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._cond:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def shutdown(self, wait=True):
+        """Stops the workers once the queued tasks are done."""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                if worker is not threading.current_thread():
+                    worker.join()
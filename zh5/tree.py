@@ -1,37 +1,56 @@
+import bisect
+
+import numpy as np
+
+
 class BtreeV1:
     def __init__(self, file, offset):
         self._f = file
         self._o = offset
 
-        self._f.seek(self._o)
-        byts = self._f.read(8 + self._f.size_of_offsets * 2)
+        # N entries = B-tree contains N child pointers and N+1 keys.
+        # Each tree has 2K + 1 keys with 2K child pointers interleaved between
+        # the keys.The number of keys and child pointers actually containing
+        # valid values is determined by the node’s Entries Used field.If that
+        # field is N, then the B-tree contains N child pointers and N+1 keys.
+        # Nodes are allocated for 2K entries, read the header and all of them at once.
+        header_size = 8 + self._f.size_of_offsets * 2
+        entry_size = self.entry_dtype.itemsize
+        byts = self._f.read_at(self._o, header_size + 2 * self.node_k * entry_size + self.keysize)
         assert byts[:4] == b"TREE"
         self._node_type = byts[4]  # 0 group, 1 dataset
         self._node_level = byts[5]  # 0 is root of the tree
         self._entries_used = int.from_bytes(byts[6:8], "little")
-        self._entries_offset = file.tell()
+        self._entries_offset = self._o + header_size
         self._address_left_sibling = int.from_bytes(byts[8:8 + self._f.size_of_offsets], "little")
         self._address_right_sibling = int.from_bytes(
             byts[8 + self._f.size_of_offsets:8 + 2 * self._f.size_of_offsets], "little")
 
-        # N entries = B-tree contains N child pointers and N+1 keys.
-        # Each tree has 2K + 1 keys with 2K child pointers interleaved between
-        # the keys.The number of keys and child pointers actually containing
-        # valid values is determined by the node’s Entries Used field.If that
-        # field is N, then the B-tree contains N child pointers and N+1 keys.
-        n = self._entries_used + self._entries_used + 1
-        bytsl = (
-                self._entries_used * self._f.size_of_offsets +  # child entries
-                self._entries_used * 24  # 1-4, 4-8, 1dim+64bit
-        )
-        byts = file.read(bytsl)
-        # esto es donde está el chunk en bytes en el fichero
-        # el tamanio se saca de la key
-        # 24 es el tamanio de la primera key, de donde sale? 8+8*2, for type1 nodes
-        # print(int.from_bytes(byts[24:24 + self._fh.size_of_offsets], "little"))
+        n = self._entries_used
+        node_size = header_size + n * entry_size + self.keysize
+        if len(byts) < node_size:  # K is not the one assumed
+            byts = bytes(byts) + bytes(self._f.read_at(self._o + len(byts), node_size - len(byts)))
+
+        entries = np.frombuffer(byts, dtype=self.entry_dtype, count=n, offset=header_size)
+        last_key = np.frombuffer(byts, dtype=self.key_dtype, count=1, offset=header_size + n * entry_size)
+        self._keys = np.concatenate([entries["key"], last_key])
+        self._children = entries["child"].astype(np.int64)
+
+    @property
+    def key_dtype(self):
+        raise NotImplementedError
+
+    @property
+    def entry_dtype(self):
+        """A key and the child pointer after it."""
+        return np.dtype([("key", self.key_dtype), ("child", f"<u{self._f.size_of_offsets}")])
 
     @property
     def keysize(self):
+        return self.key_dtype.itemsize
+
+    @property
+    def node_k(self):
         raise NotImplementedError
 
     @property
@@ -51,65 +70,112 @@ class BtreeV1:
         return self._address_right_sibling if self._address_right_sibling != self._f.undefined_address else None
 
     def children(self):
-        self._f.seek(self._entries_offset)
-        for i in range(self._entries_used):
-            self._f.read(self.keysize)  # read the key
-            byts = self._f.read(self._f.size_of_offsets)  # read the child pointer
+        yield from self._children.tolist()
 
 
 class BtreeV1Chunk(BtreeV1):
     def __init__(self, file, offset, dataset):
+        self._dataset = dataset  # the key size depends on its rank
         super(BtreeV1Chunk, self).__init__(file, offset)
-        self._dataset = dataset
+        self._key_tuples = None
 
     @property
-    def keysize(self):
-        return 8 + 8 * (self._dataset.ndim + 1)
+    def key_dtype(self):
+        return np.dtype([("size", "<u4"), ("filter_mask", "<u4"), ("offset", "<u8", (self._dataset.ndim + 1,))])
 
-    def inspect_nodes(self):
-        keysize = self.keysize
-        for i in range(self._entries_used):
-            offset = self._entries_offset + ((keysize + self._f.size_of_offsets) * i)
-            self._f.seek(offset)
-            kbyts = self._f.read(keysize)  # read the key
-            byts = self._f.read(self._f.size_of_offsets)  # read the child pointer
+    @property
+    def node_k(self):
+        return self._f.indexed_storage_internal_node_k
+
+    def keys_and_children(self):
+        """The N + 1 keys of the node as (chunk size, filter mask, chunk offset) and its N child addresses. Child i
+        holds the chunks from key i up to key i + 1, in lexicographic order of their offsets."""
+        if self._key_tuples is None:
+            offsets = map(tuple, self._keys["offset"][:, :self._dataset.ndim].tolist())
+            self._key_tuples = list(zip(self._keys["size"].tolist(), self._keys["filter_mask"].tolist(), offsets))
 
+        return self._key_tuples, self._children.tolist()
+
+    @property
+    def key_range(self):
+        """First and last keys of the node, its chunks and those below are the ones in [first, last) in lexicographic
+        order of their offsets."""
+        keys, _ = self.keys_and_children()
+        return keys[0][2], keys[-1][2]
+
+    def find_leaves(self, offsets, nodes):
+        """Yields the leaves whose key range holds one of `offsets`, a sorted list of tuples, reading only the nodes
+        on the way to them. `nodes` caches the nodes read, by address."""
+        if self.level == 0:
+            yield self
+            return
+
+        keys, children = self.keys_and_children()
+        for i, child in enumerate(children):
+            lo = bisect.bisect_left(offsets, keys[i][2])
+            hi = bisect.bisect_right(offsets, keys[i + 1][2])
+            if lo < hi:
+                if child not in nodes:
+                    nodes[child] = BtreeV1Chunk(self._f, child, self._dataset)
+                yield from nodes[child].find_leaves(offsets[lo:hi], nodes)
+
+    def find_chunks(self, offsets, nodes):
+        """Yields the chunks (as inspect_chunks does) whose offsets are in `offsets`, a sorted list of tuples, reading
+        only the nodes whose key range holds one of them. `nodes` caches the nodes read, by address."""
+        for leaf in self.find_leaves(offsets, nodes):
+            keys, children = leaf.keys_and_children()
+            for (length, filter_mask, chunk_offset), child in zip(keys, children):
+                i = bisect.bisect_left(offsets, chunk_offset)
+                if i < len(offsets) and offsets[i] == chunk_offset:
+                    yield {"offset": child,
+                           "length": length,
+                           "filter_mask": filter_mask,
+                           "chunk_offset": chunk_offset,
+                           "type": "chunk",
+                           "object": self._dataset.name}
+
+    def chunk_arrays(self, nodes=None):
+        """Offsets, of shape (N, ndim), addresses, sizes and filter masks of all the chunks under the node, as
+        NumPy arrays. `nodes` caches the nodes read, by address."""
+        if self.level == 0:
+            keys = self._keys[:self._entries_used]
+            return keys["offset"][:, :self._dataset.ndim], self._children, keys["size"], keys["filter_mask"]
+
+        nodes = {} if nodes is None else nodes
+        arrays = []
+        for child in self._children.tolist():
+            if child not in nodes:
+                nodes[child] = BtreeV1Chunk(self._f, child, self._dataset)
+            arrays.append(nodes[child].chunk_arrays(nodes))
+        return tuple(np.concatenate(a) for a in zip(*arrays))
+
+    def inspect_nodes(self):
+        entry_size = self.entry_dtype.itemsize
+        for i, child in enumerate(self._children.tolist()):
             yield {
                 "level": self._node_level,
                 "entry": i,
-                "offset": offset,
+                "offset": self._entries_offset + entry_size * i,
                 "dataset": self._dataset.name,
             }
 
             if self.level != 0:
-                child = BtreeV1Chunk(self._f, int.from_bytes(byts, "little"), self._dataset)
-                yield from child.inspect_nodes()
+                yield from BtreeV1Chunk(self._f, child, self._dataset).inspect_nodes()
 
     def inspect_chunks(self):
-        keysize = self.keysize
-        for i in range(self._entries_used):
-            offset = self._entries_offset + ((keysize + self._f.size_of_offsets) * i)
-            self._f.seek(offset)
-            kbyts = self._f.read(keysize)  # read the key
-            byts = self._f.read(self._f.size_of_offsets)  # read the child pointer
-
-            chunk_offset_list = []
-            for j in range(self._dataset.ndim):
-                frm = 8 + 8 * j
-                to = frm + 8
-                chunk_offset_list.append(int.from_bytes(kbyts[frm:to], "little"))
+        if self.level != 0:
+            for child in self._children.tolist():
+                yield from BtreeV1Chunk(self._f, child, self._dataset).inspect_chunks()
+            return
 
-            if self.level != 0:
-                child = BtreeV1Chunk(self._f, int.from_bytes(byts, "little"), self._dataset)
-                yield from child.inspect_chunks()
-            else:
-                d = {"offset": int.from_bytes(byts, "little"),
-                     "length": int.from_bytes(kbyts[:4], "little"),
-                     "filter_mask": kbyts[4:8],
-                     "chunk_offset": tuple(chunk_offset_list),
-                     "type": "chunk",
-                     "object": self._dataset.name}
-                yield d
+        keys, children = self.keys_and_children()
+        for (length, filter_mask, chunk_offset), child in zip(keys, children):
+            yield {"offset": child,
+                   "length": length,
+                   "filter_mask": filter_mask,
+                   "chunk_offset": chunk_offset,
+                   "type": "chunk",
+                   "object": self._dataset.name}
 
 
 class BtreeV1Group(BtreeV1):
@@ -118,33 +184,40 @@ class BtreeV1Group(BtreeV1):
         self._group = group
 
     @property
-    def keysize(self):
-        return self._f.size_of_lengths
+    def key_dtype(self):
+        return np.dtype(f"<u{self._f.size_of_lengths}")
 
-    def symbol_table_entries(self):
-        keysize = self.keysize
-        for i in range(self._entries_used):
-            offset = self._entries_offset + self._f.size_of_offsets + ((keysize + self._f.size_of_offsets) * i)
-            self._f.seek(offset)
-            byts = self._f.read(self._f.size_of_offsets)  # read the child pointer
-            kbyts = self._f.read(keysize)  # read the key
+    @property
+    def node_k(self):
+        return self._f.group_internal_node_k
 
+    def symbol_table_entries(self):
+        # the key after a child is the heap offset of the last name it holds
+        for child, key in zip(self._children.tolist(), self._keys[1:].tolist()):
             if self.level != 0:
-                child = BtreeV1Group(self._f, int.from_bytes(byts, "little"), self._group)
-                yield from child.symbol_table_entries()
+                yield from BtreeV1Group(self._f, child, self._group).symbol_table_entries()
             else:
-                entry = {}
-                entry["offset"] = int.from_bytes(kbyts, "little")
-                entry["snod"] = int.from_bytes(byts, "little")
-                yield entry
+                yield {"offset": key, "snod": child}
+
+
+def _little_endian(columns):
+    """Unsigned little endian integers in the rows of a (N, nbytes) uint8 array."""
+    weights = np.uint64(256) ** np.arange(columns.shape[1], dtype=np.uint64)
+    return (columns.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64).astype(np.int64)
+
+
+def _encoded_size(n):
+    """Bytes needed to encode the number n, as the library does for the record counts of v2 b-tree nodes."""
+    return (n.bit_length() - 1) // 8 + 1
 
 
 class BtreeV2:
+    PREFIX_SIZE = 10  # signature, version, type and checksum of a node
+
     def __init__(self, file, offset):
         self._f = file
-        self._f.seek(offset)
 
-        byts = self._f.read(22 + self._f.size_of_offsets + self._f.size_of_lengths)
+        byts = self._f.read_at(offset, 22 + self._f.size_of_offsets + self._f.size_of_lengths)
         assert byts[:4] == b"BTHD"
 
         self._version = byts[4]
@@ -158,81 +231,170 @@ class BtreeV2:
         self._number_of_records_in_root_node = int.from_bytes(
             byts[16 + self._f.size_of_offsets:16 + 2 + self._f.size_of_offsets], "little")
         pos = 16 + 2 + self._f.size_of_offsets
-        self._total_number_of_records_in_btree = byts[pos:pos + self._f.size_of_lengths]
+        self._total_number_of_records_in_btree = int.from_bytes(byts[pos:pos + self._f.size_of_lengths], "little")
         pos += self._f.size_of_lengths
         self._checksum = byts[-4:]
 
-        if self._depth == 0:
-            self._root_node = BtreeV2LeafNode(self._f, self._root_node_address, self)
-        else:
-            self._root_node = BtreeV2InternalNode(self._f, self._root_node_address, self)
+        # size of the fields counting the records of a child node, and of all the nodes below it, at each depth
+        max_nrec = (self._node_size - self.PREFIX_SIZE) // self._record_size  # in a leaf
+        self._max_nrec_size = _encoded_size(max_nrec)
+        cum_max_nrec = [max_nrec]
+        self._cum_max_nrec_size = [0]
+        for depth in range(1, self._depth + 1):
+            # N records and N + 1 pointers, the extra one counted with the prefix
+            pointer_size = self.pointer_size(depth)
+            max_nrec = (self._node_size - (self.PREFIX_SIZE + pointer_size)) // (self._record_size + pointer_size)
+            cum_max_nrec.append((max_nrec + 1) * cum_max_nrec[depth - 1] + max_nrec)
+            self._cum_max_nrec_size.append(_encoded_size(cum_max_nrec[depth]))
+
+        self._nodes = {}  # address -> node, every node read
+        self._root_node = None
+        if self._root_node_address != self._f.undefined_address:
+            self._root_node = self.node(self._root_node_address, self._number_of_records_in_root_node, self._depth)
 
     @property
     def type(self):
         return self._type
 
+    @property
+    def node_size(self):
+        return self._node_size
+
     @property
     def record_size(self):
         return self._record_size
 
+    @property
+    def depth(self):
+        return self._depth
+
     @property
     def nrecords(self):
-        return self._number_of_records_in_root_node
+        return self._total_number_of_records_in_btree
+
+    @property
+    def record_dtype(self):
+        if self._type == 5:  # link name index of dense groups
+            return np.dtype([("hash", "<u4"), ("heap_id", f"V{self._record_size - 4}")])
+        elif self._type == 6:  # creation order index of dense groups
+            return np.dtype([("creation_order", "<u8"), ("heap_id", f"V{self._record_size - 8}")])
+        return np.dtype([("record", f"V{self._record_size}")])
+
+    @property
+    def max_nrec_size(self):
+        return self._max_nrec_size
+
+    def pointer_size(self, depth):
+        """Size of a child pointer in the internal nodes at `depth`."""
+        return self._f.size_of_offsets + self._max_nrec_size + self._cum_max_nrec_size[depth - 1]
+
+    def node(self, address, nrecords, depth):
+        if address not in self._nodes:
+            if depth == 0:
+                self._nodes[address] = BtreeV2LeafNode(self._f, address, self, nrecords)
+            else:
+                self._nodes[address] = BtreeV2InternalNode(self._f, address, self, nrecords, depth)
+        return self._nodes[address]
 
     def records(self):
-        yield from self._root_node.records()
+        if self._root_node is not None:
+            yield from self._root_node.records()
+
+    def find(self, key):
+        """Yields the records whose first field, the hash of the name index or the creation order, is `key`,
+        reading only the nodes on the way to them."""
+        if self._root_node is not None:
+            yield from self._root_node.find(key)
 
-    def parse_record(self):  # de momento retorno dict, ya veré como hacer esto
-        d = {}
-        if self._type == 6:
-            byts = self._f.read(self.record_size)
-            d["creation_order"] = int.from_bytes(byts[:8], "little")
-            d["heap_id"] = byts[8:]
+    def parse_records(self, byts, nrecords, offset):
+        """Structured array of the `nrecords` records in `byts` from `offset`."""
+        return np.frombuffer(byts, dtype=self.record_dtype, count=nrecords, offset=offset)
 
-        return d
+    def as_dicts(self, records):
+        names = records.dtype.names
+        return [dict(zip(names, record)) for record in records.tolist()]
 
 
-class BtreeV2LeafNode:
-    def __init__(self, file, offset, tree):
+class BtreeV2Node:
+    signature = None
+
+    def __init__(self, file, offset, tree, nrecords):
         self._f = file
         self._o = offset
         self._tree = tree
+        self._nrecords = nrecords
 
-        self._f.seek(self._o)
-        byts = self._f.read(6)
-        assert byts[:4] == b"BTLF"
+        byts = self._f.read_at(self._o, self._tree.node_size)  # the whole node
+        assert byts[:4] == self.signature
         self._version = byts[4]
         self._type = byts[5]
         assert self._type == self._tree.type
 
-        # maybe need to review this, in this example the root node is a leaf node
-        # might be different if internal nodes are present
-        # From HDF5 spec: size of this field is determined by the number of records
-        # for this node and the record size (from the header). The format of records
-        # depends on the type of B-tree.
-        self._record_offset = self._f.tell()
-        self._record_size = self._tree.record_size
-        self._records_size = self._tree.record_size * self._tree.nrecords
+        self._parse(byts)
 
-        self._f.seek(self._record_offset + self._records_size)
-        self._checksum = self._f.read(4)
+    def _parse(self, byts):
+        self._records = self._tree.parse_records(byts, self._nrecords, 6)
+        self._keys = self._records[self._records.dtype.names[0]]
 
     @property
     def record_size(self):
-        return self._record_size
+        return self._tree.record_size
+
+    @property
+    def nrecords(self):
+        return self._nrecords
+
+
+class BtreeV2LeafNode(BtreeV2Node):
+    signature = b"BTLF"
 
     def records(self):
-        for i in range(self._tree.nrecords):
-            self._f.seek(self._record_offset + self.record_size * i)
-            record = self._tree.parse_record()
-            # pos = self._f.tell()
-            yield record
-            # self._f.seek(pos)
+        yield from self._tree.as_dicts(self._records)
+
+    def find(self, key):
+        lo, hi = np.searchsorted(self._keys, key, side="left"), np.searchsorted(self._keys, key, side="right")
+        yield from self._tree.as_dicts(self._records[lo:hi])
+
+
+class BtreeV2InternalNode(BtreeV2Node):
+    signature = b"BTIN"
 
+    def __init__(self, file, offset, tree, nrecords, depth):
+        self._depth = depth
+        super().__init__(file, offset, tree, nrecords)
+
+    def _parse(self, byts):
+        super()._parse(byts)
+
+        # N + 1 child pointers after the records: address, number of records and, below depth 1, total number of
+        # records of the child
+        pointer_size = self._tree.pointer_size(self._depth)
+        columns = np.frombuffer(byts, dtype=np.uint8, count=(self._nrecords + 1) * pointer_size,
+                                offset=6 + self._nrecords * self.record_size).reshape(-1, pointer_size)
+        size_of_offsets = self._f.size_of_offsets
+        self._children = _little_endian(columns[:, :size_of_offsets]).tolist()
+        self._children_nrecords = _little_endian(
+            columns[:, size_of_offsets:size_of_offsets + self._tree.max_nrec_size]).tolist()
+
+    @property
+    def depth(self):
+        return self._depth
 
-class BtreeV2InternalNode:
-    def __init__(self, file, offset, tree):
-        pass
+    def child(self, i):
+        return self._tree.node(self._children[i], self._children_nrecords[i], self._depth - 1)
 
     def records(self):
-        yield 1
+        records = self._tree.as_dicts(self._records)
+        for i in range(self._nrecords + 1):
+            yield from self.child(i).records()
+            if i < self._nrecords:
+                yield records[i]
+
+    def find(self, key):
+        # child i holds the records between record i - 1 and record i
+        lo, hi = np.searchsorted(self._keys, key, side="left"), np.searchsorted(self._keys, key, side="right")
+        records = self._tree.as_dicts(self._records[lo:hi])
+        for i in range(lo, hi + 1):
+            yield from self.child(i).find(key)
+            if i < hi:
+                yield records[i - lo]